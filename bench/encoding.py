@@ -0,0 +1,71 @@
+"""On-disk size and scan speed of the binary row format against JSON rows.
+
+Writes the same generated rows into two B-trees, one with the JSON lists the
+engine used to store and one with RowCodec, then reports file sizes, the time
+to scan and decode every row, and the time to read a single column.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+COLS = OrderedDict(id=['int', 0, True, True, False], name=['char', 20, False, False, False],
+                   score=['int', 0, False, False, False], born=['date', 0, False, False, False],
+                   city=['char', 10, False, False, False])
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--repo', default=os.path.join(os.path.dirname(__file__), '..'))
+    ap.add_argument('--rows', type=int, default=100000)
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    sys.path.insert(0, os.path.abspath(args.repo))
+    from bsddb3 import db
+    from storage import RID, RowCodec
+    os.chdir(tempfile.mkdtemp())
+
+    rnd = random.Random(0)
+    rows = []
+    for i in range(args.rows):
+        born = None if rnd.random()<0.1 else f'19{rnd.randrange(50,99)}-0{rnd.randrange(1,9)}-1{rnd.randrange(0,9)}'
+        rows.append([i, f'name{rnd.randrange(10**6)}', rnd.randrange(1000), born, rnd.choice(['seoul', 'busan', None])])
+
+    codec = RowCodec(COLS)
+    formats = {'json': (lambda row: json.dumps(row).encode(), json.loads, lambda data: json.loads(data)[2]),
+               'binary': (codec.encode, codec.decode, lambda data: codec.column(data, 2))}
+    results = {}
+    for name,(encode,decode,column) in formats.items():
+        rdb = db.DB()
+        rdb.open(f'{name}.db', dbtype=db.DB_BTREE, flags=db.DB_CREATE)
+        payload = 0
+        for rid,row in enumerate(rows, 1):
+            rdb.put(RID.pack(rid), data:=encode(row))
+            payload += len(data)
+        rdb.sync()
+
+        def best(fn):
+            times = []
+            for _ in range(args.repeat):
+                cursor = rdb.cursor()
+                start = time.perf_counter()
+                while (kv:=cursor.next()) is not None:
+                    fn(kv[1])
+                times.append(time.perf_counter()-start)
+                cursor.close()
+            return min(times)
+
+        results[name] = (payload, os.path.getsize(f'{name}.db'), best(lambda data: None), best(decode), best(column))
+        rdb.close()
+
+    print(f"rows               {args.rows}")
+    for name,(payload,size,walk,scan,column) in results.items():
+        print(f"{name:<8} {payload/args.rows:5.1f} bytes/row  file {size/2**20:7.2f} MiB  scan {(scan-walk)/args.rows*1e9:5.0f} ns/row  "
+              f"one column {(column-walk)/args.rows*1e9:5.0f} ns/row")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Parse throughput of the SQL front end.
+
+Builds the parser the old way (Earley, grammar compiled at every start) and the
+current way (LALR, tables loaded from lark's cache) and parses the same corpus
+of statements with both, reporting startup time and statements per second.
+The corpus is a query log with one statement per line, either plain SQL or
+JSON objects with a "query" (or "sql") field; without --corpus a mixed log of
+DDL, INSERTs, SELECTs and DELETEs is generated.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+def generate(n, rnd):
+    queries = []
+    for i in range(n):
+        kind = rnd.random()
+        if kind<0.5:
+            born = 'null' if rnd.random()<0.1 else f'19{rnd.randrange(50,99)}-0{rnd.randrange(1,9)}-1{rnd.randrange(0,9)}'
+            queries.append(f"insert into w values ({i}, 'n{rnd.randrange(1000)}', {rnd.randrange(100)}, {born});")
+        elif kind<0.85:
+            queries.append(f"select w.id, name as n, d.title from w, d as d where w.id = d.wid and "
+                           f"(score > {rnd.randrange(100)} or born is not null) and name != 'x{i}' limit 10;")
+        elif kind<0.95:
+            queries.append(f"delete from w where id = {i} and not (score < {rnd.randrange(100)});")
+        else:
+            queries.append(f"create table t{i} (id int not null, name char(20), born date, "
+                           f"primary key (id), foreign key (id) references w (id));")
+    return queries
+
+def read_corpus(path):
+    queries = []
+    with open(path) as file:
+        for line in file:
+            if not (line:=line.strip()):
+                continue
+            if line.startswith('{'):
+                entry = json.loads(line)
+                line = entry.get('query') or entry.get('sql') or ''
+            if not line.endswith(';'):
+                line += ';'
+            queries.append(line)
+    return queries
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--repo', default=os.path.join(os.path.dirname(__file__), '..'))
+    ap.add_argument('--corpus')
+    ap.add_argument('--queries', type=int, default=2000)
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    repo = os.path.abspath(args.repo)
+    with open(os.path.join(repo, 'grammar.lark')) as file:
+        grammar = file.read()
+    import lark
+
+    queries = read_corpus(args.corpus) if args.corpus else generate(args.queries, random.Random(0))
+
+    def build(**options):
+        start = time.perf_counter()
+        parser = lark.Lark(grammar, start="command", **options)
+        return parser, time.perf_counter()-start
+
+    def best(parser):
+        times = []
+        for _ in range(args.repeat):
+            failed = 0
+            start = time.perf_counter()
+            for query in queries:
+                try:
+                    parser.parse(query)
+                except lark.exceptions.UnexpectedInput:
+                    failed += 1
+            times.append(time.perf_counter()-start)
+        return min(times), failed
+
+    earley, earley_build = build(lexer='standard')
+    _, lalr_build = build(parser='lalr')
+    build(parser='lalr', cache=True) # writes the cache if it is not there yet
+    lalr, lalr_load = build(parser='lalr', cache=True)
+    earley_time, failed = best(earley)
+    lalr_time, _ = best(lalr)
+
+    print(f"statements         {len(queries)} ({failed} rejected)")
+    print(f"earley startup     {earley_build*1e3:.1f} ms")
+    print(f"lalr startup       {lalr_build*1e3:.1f} ms (cached {lalr_load*1e3:.1f} ms)")
+    print(f"earley             {len(queries)/earley_time:.0f} stmt/s ({earley_time/len(queries)*1e6:.0f} us/stmt)")
+    print(f"lalr               {len(queries)/lalr_time:.0f} stmt/s ({lalr_time/len(queries)*1e6:.0f} us/stmt)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Throughput and latency of the server under many concurrent clients.
+
+Starts server.py on a unix socket in a temporary directory, loads a key/value
+table and then runs --clients threads, each with its own connection, issuing
+point SELECTs and (with --writes) single-row INSERTs for --seconds. Reports
+queries per second and p50/p99 latency overall and per kind of query.
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values)-1, int(len(values)*p))] if values else 0
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--repo', default=os.path.join(os.path.dirname(__file__), '..'))
+    ap.add_argument('--rows', type=int, default=10000)
+    ap.add_argument('--clients', type=int, default=16)
+    ap.add_argument('--workers', type=int, default=8)
+    ap.add_argument('--seconds', type=float, default=5)
+    ap.add_argument('--writes', type=float, default=0.1, help="fraction of queries that insert")
+    args = ap.parse_args()
+
+    repo = os.path.abspath(args.repo)
+    sys.path.insert(0, repo)
+    from client import Client
+
+    home = tempfile.mkdtemp()
+    address = os.path.join(home, 'server.sock')
+    server = subprocess.Popen([sys.executable, os.path.join(repo, 'server.py'), '--home', home,
+                               '--listen', address, '--workers', str(args.workers)], stdout=subprocess.DEVNULL)
+    try:
+        while not os.path.exists(address):
+            if server.poll() is not None:
+                sys.exit("server did not start")
+            time.sleep(0.05)
+
+        with Client(address) as client:
+            client.execute("create table kv (k int, v char(20), primary key (k));")
+            for start in range(0, args.rows, 1000):
+                rows = ', '.join(f"({k}, 'value{k}')" for k in range(start, min(start+1000, args.rows)))
+                client.execute(f"insert into kv values {rows};")
+
+        latencies = {'select':[], 'insert':[]}
+        stop = time.perf_counter()+args.seconds
+        def run(n):
+            rnd = random.Random(n)
+            key = args.rows + n*10**9
+            mine = {'select':[], 'insert':[]}
+            with Client(address) as client:
+                while time.perf_counter()<stop:
+                    if rnd.random()<args.writes:
+                        kind, sql = 'insert', f"insert into kv values ({key}, 'new');"
+                        key += 1
+                    else:
+                        kind, sql = 'select', f"select v from kv where k = {rnd.randrange(args.rows)};"
+                    start = time.perf_counter()
+                    client.execute(sql)
+                    mine[kind].append(time.perf_counter()-start)
+            for kind in mine:
+                latencies[kind].extend(mine[kind])
+
+        threads = [threading.Thread(target=run, args=(n,)) for n in range(args.clients)]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter()-began
+    finally:
+        server.terminate()
+        server.wait()
+
+    total = latencies['select']+latencies['insert']
+    print(f"clients            {args.clients} ({args.workers} workers)")
+    print(f"queries            {len(total)} in {elapsed:.1f} s")
+    print(f"qps                {len(total)/elapsed:.0f}")
+    for kind,values in [('all', total)]+list(latencies.items()):
+        if values:
+            print(f"{kind:<8} p50 {percentile(values, 0.5)*1e3:7.2f} ms   p99 {percentile(values, 0.99)*1e3:7.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Workloads of the engine at a few scales, reported as JSON.
+
+Every scale builds a fresh database with a chain of foreign keys, region <-
+customer <- orders, where --scales gives the number of orders and there is a
+customer for every ten orders and a region for every thousand. The workloads
+then run through the Database API, one timed call at a time:
+
+  load      the bulk load of all three tables (prepared executemany, batches)
+  insert    single row inserts
+  point     primary key lookups
+  range     a range of the orders' primary key plus a filter no index serves
+  join2     orders of one customer joined with the customer
+  join3     orders of one region, through customer, counted
+  delete    a customer's orders, then the customer, checked against its orders
+
+Each workload reports its count of operations, their throughput and latency
+percentiles in milliseconds; each scale the peak RSS of the process so far.
+Data and keys come from a seeded generator so runs can be compared across
+commits: python bench/suite.py --output before.json, check out, run again.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SCALES = [1000, 100000, 1000000]
+BATCH = 10000
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered)-1, int(len(ordered)*p))]
+
+def summary(latencies, ops=None):
+    # ops: operations behind each timed call, when a call does more than one
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    ops = len(ordered) if ops is None else ops
+    return dict(ops=ops, seconds=round(total, 4), ops_per_s=round(ops/total, 1) if total else None,
+                p50_ms=round(percentile(ordered, 0.5)*1000, 4), p95_ms=round(percentile(ordered, 0.95)*1000, 4),
+                p99_ms=round(percentile(ordered, 0.99)*1000, 4), max_ms=round(ordered[-1]*1000, 4))
+
+def timed(calls):
+    latencies = []
+    clock = time.perf_counter
+    for call in calls:
+        start = clock()
+        call()
+        latencies.append(clock()-start)
+    return latencies
+
+def date(rnd):
+    return f'{rnd.randrange(1950, 2010)}-{rnd.randrange(1, 13):02}-{rnd.randrange(1, 29):02}'
+
+def run_scale(engine, rows, ops, seed):
+    rnd = random.Random(seed)
+    database = engine.Database('.')
+    execute = database.execute
+    regions, customers = max(rows//1000, 5), max(rows//10, 10)
+    results = {}
+
+    execute("create table region (id int, name char(16), primary key (id));")
+    execute("create table customer (id int, region_id int, name char(24), born date, primary key (id), foreign key (region_id) references region (id));")
+    execute("create table orders (id int, customer_id int, amount int, placed date, primary key (id), foreign key (customer_id) references customer (id));")
+
+    def load(sql, count, row):
+        insert = database.prepare(sql)
+        batches = [[row(i) for i in range(base, min(base+BATCH, count))] for base in range(0, count, BATCH)]
+        return timed(lambda batch=batch: insert.executemany(batch) for batch in batches)
+    latencies = load("insert into region values (?, ?);", regions, lambda i: (i, f'region{i}'))
+    latencies += load("insert into customer values (?, ?, ?, ?);", customers,
+                      lambda i: (i, rnd.randrange(regions), f'customer{rnd.randrange(10**6)}', date(rnd)))
+    latencies += load("insert into orders values (?, ?, ?, ?);", rows,
+                      lambda i: (i, rnd.randrange(customers), rnd.randrange(10000), date(rnd)))
+    results['load'] = summary(latencies, regions+customers+rows)
+
+    insert = database.prepare("insert into orders values (?, ?, ?, ?);")
+    params = [(rows+i, rnd.randrange(customers), rnd.randrange(10000), date(rnd)) for i in range(ops)]
+    results['insert'] = summary(timed(lambda p=p: insert.execute(*p) for p in params))
+
+    point = database.prepare("select * from orders where id = ?;")
+    results['point'] = summary(timed(lambda k=rnd.randrange(rows): point.execute(k) for _ in range(ops)))
+
+    scan = database.prepare("select id, amount from orders where id >= ? and id < ? and amount < 5000;")
+    starts = [rnd.randrange(rows) for _ in range(ops)]
+    results['range'] = summary(timed(lambda k=k: scan.execute(k, k+100) for k in starts))
+
+    join2 = database.prepare("select orders.id, customer.name from orders, customer where orders.customer_id = customer.id and customer.id = ?;")
+    results['join2'] = summary(timed(lambda k=rnd.randrange(customers): join2.execute(k) for _ in range(ops)))
+
+    join3 = database.prepare("select count(*) from orders, customer, region where orders.customer_id = customer.id and customer.region_id = region.id and region.id = ?;")
+    results['join3'] = summary(timed(lambda k=rnd.randrange(regions): join3.execute(k) for _ in range(max(ops//100, 3))))
+
+    # orders first, or the customer would stay for referential integrity
+    victims = rnd.sample(range(customers), min(ops, customers))
+    def cascade(k):
+        execute(f"delete from orders where customer_id = {k};")
+        execute(f"delete from customer where id = {k};")
+    results['delete'] = summary(timed(lambda k=k: cascade(k) for k in victims))
+
+    database.close()
+    results['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return results
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--repo', default=os.path.join(os.path.dirname(__file__), '..'))
+    ap.add_argument('--scales', default=','.join(map(str, SCALES)), help="orders per scale, comma separated")
+    ap.add_argument('--ops', type=int, default=1000, help="timed calls per workload")
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--output', help="write the report here instead of stdout")
+    args = ap.parse_args()
+
+    repo = os.path.abspath(args.repo)
+    sys.path.insert(0, repo)
+    import parser as engine
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=repo, capture_output=True, text=True).stdout.strip() or None
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=repo, capture_output=True, text=True).stdout!=''
+    except OSError:
+        commit = dirty = None
+    report = dict(commit=commit, dirty=dirty, python=platform.python_version(), seed=args.seed, ops=args.ops,
+                  columnar=engine.np is not None, scales={})
+
+    for rows in map(int, args.scales.split(',')):
+        home = tempfile.mkdtemp()
+        cwd = os.getcwd()
+        os.chdir(home)
+        try:
+            with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+                report['scales'][rows] = run_scale(engine, rows, args.ops, args.seed)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(home)
+        print(f"{rows} rows done", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text+'\n')
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Per-row cost of evaluating a WHERE clause.
+
+Loads a table through the engine, then times the same SELECT with and without
+a WHERE clause; the difference divided by the row count is what evaluating the
+predicate costs per row. Run it once more with --repo pointing at a checkout of
+an older commit (e.g. a `git worktree`) to compare before and after.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+# every row passes the last term, so both queries print the same result and
+# each term of the predicate is evaluated for every row
+WHERE = "where (score > 100 and name != 'nobody') or born = 1900-01-01 or not score < 0"
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--repo', default=os.path.join(os.path.dirname(__file__), '..'))
+    ap.add_argument('--rows', type=int, default=2000)
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args()
+
+    repo = os.path.abspath(args.repo)
+    with open(os.path.join(repo, 'grammar.lark')) as file:
+        grammar = file.read()
+    os.chdir(tempfile.mkdtemp())
+    sys.path.insert(0, repo)
+    import lark
+    import parser as engine
+
+    lp = lark.Lark(grammar, start="command", lexer='standard')
+    if hasattr(engine, 'store'):
+        store, transformer = engine.store, engine.Transformer()
+    else:
+        store = engine.Storage()
+        transformer = engine.Transformer(store)
+    def run(query):
+        transformer.clean()
+        with contextlib.redirect_stdout(io.StringIO()), getattr(store, 'statement', contextlib.nullcontext)():
+            transformer.transform(lp.parse(query))
+
+    rnd = random.Random(0)
+    run("create table w (id int, name char(10), score int, born date, primary key (id));")
+    for i in range(args.rows):
+        born = 'null' if rnd.random()<0.1 else f'19{rnd.randrange(50,99)}-0{rnd.randrange(1,9)}-1{rnd.randrange(0,9)}'
+        run(f"insert into w values ({i}, 'n{rnd.randrange(1000)}', {rnd.randrange(100)}, {born});")
+
+    def best(query):
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            run(query)
+            times.append(time.perf_counter()-start)
+        return min(times)
+
+    plain = best("select id from w;")
+    where = best(f"select id from w {WHERE};")
+    print(f"rows               {args.rows}")
+    print(f"select             {plain*1e3:.2f} ms")
+    print(f"select ... where   {where*1e3:.2f} ms")
+    print(f"per row predicate  {(where-plain)/args.rows*1e9:.0f} ns")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import sys
+import threading
+from collections import OrderedDict
+
+# select results, kept by the normalized statement together with the catalog
+# version and the version of every table it read. a write bumps the versions
+# of its table, so the next lookup finds the entry stale and drops it; the
+# least recently used entries go once the sizes add up past the capacity.
+# sizes are estimated the way Sort does, measuring one row in 64
+CACHE_SIZE = 64<<20
+
+class ResultCache:
+    def __init__(self, capacity=CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, versions):
+        with self.lock:
+            if (entry:=self.entries.get(key)) is None or entry[0]!=versions:
+                if entry is not None:
+                    del self.entries[key]
+                    self.size -= entry[2]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, versions, rows, size):
+        with self.lock:
+            if (entry:=self.entries.pop(key, None)) is not None:
+                self.size -= entry[2]
+            self.entries[key] = (versions, rows, size)
+            self.size += size
+            while self.size>self.capacity:
+                _,(_,_,n) = self.entries.popitem(last=False)
+                self.size -= n
+                self.evictions += 1
+
+    def collect(self, key, versions, rows):
+        # passes the rows on while keeping them; a result that outgrows the
+        # cache, or is not read to the end, is not kept
+        kept, size = [], sys.getsizeof([])
+        for n,row in enumerate(rows):
+            if kept is not None:
+                if n%64==0:
+                    row_size = sys.getsizeof(row)+sum(map(sys.getsizeof, row))+8
+                kept.append(row)
+                if (size:=size+row_size)>self.capacity:
+                    kept = None
+            yield row
+        if kept is not None:
+            self.put(key, versions, kept, size)
+
+    def stats(self):
+        with self.lock:
+            return dict(hits=self.hits, misses=self.misses, evictions=self.evictions, entries=len(self.entries), bytes=self.size)
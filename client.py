@@ -0,0 +1,84 @@
+import json
+import socket
+import struct
+import sys
+
+# requests and replies are length prefixed utf-8 frames; a request is sql text
+# (one or more statements ending with ';'), a reply is a json object holding
+# what the statements printed and the name of the error that stopped them
+FRAME = struct.Struct('>I')
+
+class ServerError(Exception):
+    def __init__(self, error, output):
+        super().__init__(error)
+        self.error = error
+        self.output = output
+
+def parse_address(address):
+    # host:port is tcp, anything else the path of a unix socket
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+def send_msg(sock, data):
+    sock.sendall(FRAME.pack(len(data)) + data)
+
+def recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf)<n:
+        if not (chunk:=sock.recv(n-len(buf))):
+            return None
+        buf += chunk
+    return bytes(buf)
+
+def recv_msg(sock):
+    if (head:=recv_exact(sock, FRAME.size)) is None:
+        return None
+    return recv_exact(sock, FRAME.unpack(head)[0])
+
+class Client:
+    def __init__(self, address):
+        family, addr = parse_address(address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.connect(addr)
+        if family==socket.AF_INET:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def execute(self, sql):
+        send_msg(self.sock, sql.encode())
+        if (reply:=recv_msg(self.sock)) is None:
+            raise ConnectionError("server closed the connection")
+        reply = json.loads(reply)
+        if reply['error'] is not None:
+            raise ServerError(reply['error'], reply['output'])
+        return reply['output']
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+if __name__ == "__main__":
+    prompt = "DB_example> "
+    client = Client(sys.argv[1] if len(sys.argv)>1 else '127.0.0.1:5433')
+    while True:
+        try:
+            s = input(prompt)
+            while s.strip() and not s.rstrip().endswith(';'):
+                s += '\n' + input()
+        except EOFError:
+            break
+        if not s.strip():
+            continue
+        try:
+            print(client.execute(s), end='')
+        except ServerError as e:
+            print(e.output, end='')
+        except ConnectionError:
+            break
+    client.close()
@@ -0,0 +1,117 @@
+from executor import Scan
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# the columnar path of a filtered sequential scan. rows are read in batches and
+# the columns the where clause needs are decoded into numpy arrays straight from
+# the fixed slots of the row format (ints as int64, dates as yyyymmdd, chars as
+# fixed width utf-8 bytes, each with a null mask); the condition is evaluated as
+# boolean masks over the whole batch and only matching rows are decoded.
+# a condition is a pair of masks, the rows where it is true and those where it is
+# false; rows in neither are unknown (null), so not swaps the pair and and/or
+# combine both halves the way three valued logic does
+BATCH = 65536
+SLOT_DTYPES = {'q':'>i8', 'I':'>u4', 'H':'>u2'}
+
+def row_dtype(codec):
+    names, formats, offsets = ['nulls'], [('u1', (len(codec.no_nulls),))], [0]
+    for i,(slot,off) in enumerate(codec.slots):
+        names.append(f'c{i}')
+        formats.append(SLOT_DTYPES[slot.format[-1]])
+        offsets.append(off)
+    return np.dtype(dict(names=names, formats=formats, offsets=offsets, itemsize=codec.fixed.size))
+
+def scalar(c_type, value):
+    # a literal in the representation of the column arrays
+    if value is None or c_type=='int':
+        return value
+    if c_type=='date':
+        return int(value[:4]+value[5:7]+value[8:10])
+    return value.encode()
+
+def compare(op, left, right):
+    # operands are (values, null mask) pairs; literals have no null mask
+    (lv,ln), (rv,rn) = left, right
+    result = op(lv, rv)
+    known = ~ln if rn is None else ~rn if ln is None else ~(ln|rn)
+    return result&known, ~result&known
+
+def mask_and(masks):
+    t, f = masks[0]
+    for mt,mf in masks[1:]:
+        t, f = t&mt, f|mf
+    return t, f
+
+def mask_or(masks):
+    t, f = masks[0]
+    for mt,mf in masks[1:]:
+        t, f = t|mt, f&mf
+    return t, f
+
+class Columns:
+    # one batch of stored rows; columns are decoded on first use, addressed by
+    # their offset in the from clause layout
+    def __init__(self, codec, dtype, records, off):
+        self.codec = codec
+        self.records = records
+        self.off = off
+        size = codec.fixed.size
+        self.fixed = np.frombuffer(b''.join([record[:size] for record in records]), dtype=dtype)
+        self.cols = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def column(self, i):
+        if (col:=self.cols.get(i)) is not None:
+            return col
+        j = i-self.off
+        codec = self.codec
+        nulls = (self.fixed['nulls'][:, j>>3]>>(j&7)&1).astype(bool)
+        values = self.fixed[f'c{j}']
+        if j in codec.prev_char:
+            base = codec.fixed.size
+            ends = values.tolist()
+            starts = [0]*len(ends) if (prev:=codec.prev_char[j]) is None else self.fixed[f'c{prev}'].tolist()
+            values = np.array([record[base+start:base+end] for record,start,end in zip(self.records, starts, ends)], dtype=bytes)
+        else:
+            values = values.astype(np.int64)
+        col = self.cols[i] = (values, nulls)
+        return col
+
+    def const(self, value):
+        yes, no = np.ones(len(self), bool), np.zeros(len(self), bool)
+        return (yes, no) if value is True else (no, yes) if value is False else (no, no.copy())
+
+class ColumnarScan(Scan):
+    # pred stays the row at a time form of the same condition, for the index
+    # nested loop join that probes this table with it
+    def __init__(self, store, tbl_name, off, width, pred, mask, filter_text=''):
+        super().__init__(store, tbl_name, off, width, pred, None, filter_text)
+        self.mask = mask
+        self.label = 'Columnar' + self.label[len('Seq'):]
+
+    def batches(self):
+        return self.store.scan_batches(self.tbl_name, BATCH)
+
+    def instrument(self):
+        super().instrument()
+        batches = self.batches
+        def counted():
+            for records in batches():
+                self.scanned += len(records)
+                yield records
+        self.batches = counted
+
+    def rows(self):
+        codec = self.store.codec(self.tbl_name)
+        dtype = row_dtype(codec)
+        head, tail = [None]*self.off, [None]*(self.width-self.off-codec.ncols)
+        decode = codec.decode
+        for records in self.batches():
+            matches,_ = self.mask(Columns(codec, dtype, records, self.off))
+            for i in np.flatnonzero(matches).tolist():
+                yield head+decode(records[i])+tail
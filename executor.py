@@ -0,0 +1,375 @@
+import heapq
+import pickle
+import sys
+import tempfile
+import time
+from itertools import islice
+
+# plan operators for select; every operator produces rows laid out like the
+# from clause (all columns of every table, in order) so the where clause can be
+# evaluated against any of them, with slots of tables not joined yet left empty.
+# rows() is a generator, so rows flow through the plan one at a time and a
+# consumer that stops pulling (LIMIT) stops every scan below it
+
+class Plan:
+    label = ''
+    children = ()
+    est = None
+    actual = None
+
+    def explain(self, depth=0):
+        lines = ['  '*depth + ('-> ' if depth else '') + self.label + self.actual_text()]
+        for child in self.children:
+            lines += child.explain(depth+1)
+        return lines
+
+    def actual_text(self):
+        if self.actual is None:
+            return ''
+        rows, elapsed = self.actual
+        return f' (actual rows={rows} time={elapsed*1000:.3f} ms)'
+
+    def instrument(self):
+        # EXPLAIN ANALYZE: counts the rows every operator hands up and the time
+        # spent getting them, the operators below included
+        self.actual = [0, 0.0]
+        rows = self.rows
+        def timed():
+            actual, clock = self.actual, time.perf_counter
+            it = rows()
+            while True:
+                start = clock()
+                try:
+                    row = next(it)
+                except StopIteration:
+                    actual[1] += clock()-start
+                    return
+                actual[1] += clock()-start
+                actual[0] += 1
+                yield row
+        self.rows = timed
+        for child in self.children:
+            child.instrument()
+
+class Scan(Plan):
+    def __init__(self, store, tbl_name, off, width, pred=None, rids=None, filter_text='', idx_name=None, order=None):
+        # rids is a list for index lookups and a generator for range scans; order
+        # is, for an index scan, the columns fixed by it and those the rows come
+        # out ascending by
+        self.store = store
+        self.tbl_name = tbl_name
+        self.off = off
+        self.width = width
+        self.pred = pred
+        self.rids = rids
+        self.filter_text = filter_text
+        self.order = order
+        if rids is None:
+            self.label = f'Seq Scan on {tbl_name}'
+        else:
+            self.label = f'Index Scan on {tbl_name} using {idx_name}'
+            if isinstance(rids, list):
+                self.est = len(rids)
+        if filter_text:
+            self.label += f' (filter: {filter_text})'
+
+    def records(self):
+        if self.rids is None:
+            return self.store.scan(self.tbl_name)
+        return ((rid, self.store.get_row(self.tbl_name, rid)) for rid in self.rids)
+
+    def actual_text(self):
+        # the rows read against those that passed the filter
+        text = super().actual_text()
+        return text[:-1] + f' scanned={self.scanned})' if text else text
+
+    def instrument(self):
+        super().instrument()
+        self.scanned = 0
+        records = self.records
+        def counted():
+            for record in records():
+                self.scanned += 1
+                yield record
+        self.records = counted
+
+    def rows(self):
+        head, tail = [None]*self.off, None
+        for _,record in self.records():
+            if record is None:
+                continue
+            if tail is None:
+                tail = [None]*(self.width-self.off-len(record))
+            row = head+record+tail
+            if self.pred is None or self.pred(row):
+                yield row
+
+class HashJoin(Plan):
+    # builds on the right input, probes with the left one; null keys never match
+    def __init__(self, left, right, keys, cond_text):
+        self.children = (left, right)
+        self.keys = keys
+        self.label = f'Hash Join ({cond_text})'
+
+    def rows(self):
+        left, right = self.children
+        lkeys = [l for l,_ in self.keys]
+        rkeys = [r for _,r in self.keys]
+        table = {}
+        for row in right.rows():
+            key = tuple(row[i] for i in rkeys)
+            if None in key:
+                continue
+            table.setdefault(key, []).append(row)
+        for row in left.rows():
+            key = tuple(row[i] for i in lkeys)
+            for match in table.get(key, ()):
+                yield merge(row, match)
+
+class IndexJoin(Plan):
+    # probes an index of the inner table with the key values of every outer row
+    def __init__(self, store, left, tbl_name, tbl, idx_name, probe, keys, inner, cond_text):
+        self.children = (left,)
+        self.store = store
+        self.tbl_name = tbl_name
+        self.tbl = tbl
+        self.idx_name = idx_name
+        self.probe = probe
+        self.keys = keys
+        self.inner = inner
+        self.label = f'Index Nested Loop Join on {tbl_name} using {idx_name} ({cond_text})'
+        idx = tbl['indexes'][idx_name]
+        if idx['unique'] and len(probe)==len(idx['cols']):
+            self.est = left.est
+
+    def rows(self):
+        inner = self.inner
+        head, tail = [None]*inner.off, None
+        for row in self.children[0].rows():
+            values = [row[i] for i in self.probe]
+            if None in values:
+                continue
+            for rid in self.store.index_lookup(self.tbl_name, self.tbl, self.idx_name, values):
+                record = self.store.get_row(self.tbl_name, rid)
+                if tail is None:
+                    tail = [None]*(inner.width-inner.off-len(record))
+                match = head+record+tail
+                if any(row[l]!=match[r] for l,r in self.keys):
+                    continue
+                if inner.pred is None or inner.pred(match):
+                    yield merge(row, match)
+
+class CrossJoin(Plan):
+    label = 'Nested Loop (cross product)'
+
+    def __init__(self, left, right):
+        self.children = (left, right)
+
+    def rows(self):
+        left, right = self.children
+        inner = None
+        for row in left.rows():
+            if inner is None:
+                inner = list(right.rows())
+            for match in inner:
+                yield merge(row, match)
+
+class Filter(Plan):
+    def __init__(self, child, pred, filter_text):
+        self.children = (child,)
+        self.pred = pred
+        self.est = child.est
+        self.label = f'Filter ({filter_text})'
+
+    def rows(self):
+        pred = self.pred
+        for row in self.children[0].rows():
+            if pred(row):
+                yield row
+
+class Project(Plan):
+    def __init__(self, child, order, names):
+        self.children = (child,)
+        self.order = order
+        self.est = child.est
+        self.label = f"Project ({', '.join(names)})"
+
+    def rows(self):
+        rows = self.children[0].rows()
+        if self.order is None:
+            yield from rows
+            return
+        order = self.order
+        for row in rows:
+            yield [row[i] for i in order]
+
+# running state of an aggregate: where it starts, how a value updates it and
+# what it ends as (None to keep the state); nulls are skipped, count(*) counts rows
+AGGREGATES = {
+    'count(*)': (0, lambda state, value: state+1, None),
+    'count': (0, lambda state, value: state if value is None else state+1, None),
+    'sum': (None, lambda state, value: state if value is None else value if state is None else state+value, None),
+    'min': (None, lambda state, value: value if state is None or (value is not None and value<state) else state, None),
+    'max': (None, lambda state, value: value if state is None or (value is not None and value>state) else state, None),
+    'avg': ((0, 0), lambda state, value: state if value is None else (state[0]+value, state[1]+1),
+            lambda state: None if state[1]==0 else state[0]/state[1]),
+}
+
+class HashAggregate(Plan):
+    # one running state per group, updated as the rows stream by; rows of the
+    # aggregate are the group columns followed by the aggregates. without group
+    # columns every row falls in one group, which exists even when no row comes
+    def __init__(self, child, keys, aggs, agg_text):
+        self.children = (child,)
+        self.keys = keys
+        self.aggs = [(AGGREGATES[func], i) for func,i in aggs]
+        if len(keys)==0:
+            self.est = 1
+            self.label = f'Aggregate ({agg_text})'
+        else:
+            self.label = f'Hash Aggregate ({agg_text})'
+
+    def rows(self):
+        keys = self.keys
+        inits = [init for (init,_,_),_ in self.aggs]
+        steps = list(enumerate((step, i) for (_,step,_),i in self.aggs))
+        groups = {}
+        for row in self.children[0].rows():
+            key = tuple([row[i] for i in keys])
+            if (states:=groups.get(key)) is None:
+                states = groups[key] = inits.copy()
+            for j,(step,i) in steps:
+                states[j] = step(states[j], row[i])
+        if len(keys)==0 and len(groups)==0:
+            groups[()] = inits
+        finals = [final for (_,_,final),_ in self.aggs]
+        for key,states in groups.items():
+            yield list(key)+[state if final is None else final(state) for final,state in zip(finals, states)]
+
+class RowCount(Plan):
+    # count(*) of a whole table, read from the count kept with its rows
+    est = 1
+
+    def __init__(self, store, tbl_name):
+        self.store = store
+        self.tbl_name = tbl_name
+        self.label = f'Row Count on {tbl_name}'
+
+    def rows(self):
+        yield [self.store.row_count(self.tbl_name)]
+
+SORT_MEMORY = 64<<20
+MERGE_FANIN = 64
+RUN_BATCH = 1024
+
+class Desc:
+    # reverses the order of a value that cannot be negated
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value<self.value
+
+    def __eq__(self, other):
+        return self.value==other.value
+
+def sort_key(keys):
+    # keys are (offset, descending, nulls first); every key adds a rank placing
+    # nulls before or after the other values, and the value itself
+    def key(row):
+        out = []
+        for i,desc,nulls_first in keys:
+            if (value:=row[i]) is None:
+                out += (0 if nulls_first else 2, None)
+            elif desc:
+                out += (1, Desc(value) if isinstance(value, str) else -value)
+            else:
+                out += (1, value)
+        return tuple(out)
+    return key
+
+def spill(rows):
+    file = tempfile.TemporaryFile()
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch)==RUN_BATCH:
+            pickle.dump(batch, file, pickle.HIGHEST_PROTOCOL)
+            batch = []
+    if batch:
+        pickle.dump(batch, file, pickle.HIGHEST_PROTOCOL)
+    file.seek(0)
+    return file
+
+def read_run(file):
+    with file:
+        while True:
+            try:
+                batch = pickle.load(file)
+            except EOFError:
+                return
+            yield from batch
+
+class Sort(Plan):
+    # sorts in memory while the rows fit in the memory budget; beyond it every
+    # budget's worth of rows is sorted and written to a temporary file as a run
+    # and the runs are merged, MERGE_FANIN at a time. with a limit only that many
+    # rows are kept, in a bounded heap
+    def __init__(self, child, keys, key_text, limit=None, memory=SORT_MEMORY):
+        self.children = (child,)
+        self.keys = keys
+        self.limit = limit
+        self.memory = memory
+        if limit is None:
+            self.est = child.est
+            self.label = f'Sort ({key_text})'
+        else:
+            self.est = limit if child.est is None else min(limit, child.est)
+            self.label = f'Top-N Sort ({key_text}; {limit} rows)'
+
+    def rows(self):
+        key = sort_key(self.keys)
+        rows = self.children[0].rows()
+        if self.limit is not None:
+            yield from heapq.nsmallest(self.limit, rows, key=key)
+            return
+        runs = []
+        batch, size = [], 0
+        for n,row in enumerate(rows):
+            # the size of a row is sampled, measuring every one costs as much as sorting it
+            if n%64==0:
+                row_size = sys.getsizeof(row)+sum(map(sys.getsizeof, row))
+            batch.append(row)
+            size += row_size
+            if size>self.memory:
+                batch.sort(key=key)
+                runs.append(spill(batch))
+                batch, size = [], 0
+        batch.sort(key=key)
+        if len(runs)==0:
+            yield from batch
+            return
+        while len(runs)>MERGE_FANIN:
+            runs = [spill(heapq.merge(*map(read_run, runs[i:i+MERGE_FANIN]), key=key)) for i in range(0, len(runs), MERGE_FANIN)]
+        yield from heapq.merge(*map(read_run, runs), batch, key=key)
+
+class Limit(Plan):
+    def __init__(self, child, limit, offset):
+        self.children = (child,)
+        self.limit = limit
+        self.offset = offset
+        self.est = limit if child.est is None else min(limit, max(child.est-offset, 0))
+        self.label = f'Limit ({limit}' + (f' offset {offset})' if offset else ')')
+
+    def rows(self):
+        rows = self.children[0].rows()
+        try:
+            yield from islice(rows, self.offset, self.offset+self.limit)
+        finally:
+            rows.close()
+
+def merge(row, match):
+    # the two inputs fill disjoint slots of the from clause layout
+    return [l if r is None else r for l,r in zip(row, match)]
@@ -0,0 +1,121 @@
+import itertools
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from executor import Scan
+from storage import RID, RowCodec
+from columnar import Columns, row_dtype, np
+
+# the parallel path of a filtered sequential scan. the session reads the stored
+# rows in batches (Berkeley DB handles stay in the process that opened the
+# environment) and hands each batch, still encoded, to a pool process, which
+# decodes it and evaluates the where clause, with numpy masks when the columnar
+# scan is on, and sends back only the rows that pass. a few batches are in
+# flight at a time and their results are taken in order, so rows come out in
+# the order of a serial scan. tables under PARALLEL_MIN_ROWS stay serial, the
+# round trips would cost more than the filter
+PARALLEL_MIN_ROWS = 100000
+BATCH = 16384
+IN_FLIGHT = 2
+
+pools = {}
+pools_lock = threading.Lock()
+spec_ids = itertools.count()
+
+def get_pool(workers):
+    # one pool per degree, shared by every session of the process; spawned, as
+    # forking would copy the environment's handles and the flusher thread
+    with pools_lock:
+        if (pool:=pools.get(workers)) is None:
+            pool = pools[workers] = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        return pool
+
+# in a pool process: the where clause compiled once per scan by a Transformer
+# of its own, from the state the planning one had
+transformer = None
+compiled = {}
+
+def compile_spec(spec):
+    global transformer
+    if transformer is None:
+        from parser import Transformer
+        transformer = Transformer(None)
+    _, cols, off, width, conds, queried_tbls, tbl_cols, tbl_offs, params, columnar = spec
+    codec = RowCodec(cols)
+    transformer.clean()
+    transformer.queried_tbls = queried_tbls
+    transformer.tbl_cols = tbl_cols
+    transformer.tbl_offs = tbl_offs
+    transformer.params = params
+    if columnar and np is not None:
+        return codec, off, width, None, transformer.make_mask(conds), row_dtype(codec)
+    return codec, off, width, transformer.make_pred(conds), None, None
+
+def filter_batch(spec, records):
+    # (position in the batch, decoded row) of the rows that pass
+    if (entry:=compiled.get(spec[0])) is None:
+        if len(compiled)>=16:
+            compiled.clear()
+        entry = compiled[spec[0]] = compile_spec(spec)
+    codec, off, width, pred, mask, dtype = entry
+    decode = codec.decode
+    if mask is not None:
+        matches,_ = mask(Columns(codec, dtype, records, off))
+        return [(i, decode(records[i])) for i in np.flatnonzero(matches).tolist()]
+    head, tail = [None]*off, [None]*(width-off-codec.ncols)
+    out = []
+    for i,data in enumerate(records):
+        record = decode(data)
+        if pred(head+record+tail):
+            out.append((i, record))
+    return out
+
+class ParallelScan(Scan):
+    # pred stays the row at a time form of the condition, for the index nested
+    # loop join that probes this table with it; spec is what a pool process
+    # needs to compile it again
+    def __init__(self, store, tbl_name, off, width, pred, spec, workers, filter_text=''):
+        super().__init__(store, tbl_name, off, width, pred, None, filter_text)
+        self.spec = (next(spec_ids), *spec)
+        self.workers = workers
+        self.label = f'Parallel {self.label} ({workers} workers)'
+
+    def batches(self):
+        return self.store.scan_batches(self.tbl_name, BATCH, keys=True)
+
+    def instrument(self):
+        super().instrument()
+        batches = self.batches
+        def counted():
+            for rids, records in batches():
+                self.scanned += len(records)
+                yield rids, records
+        self.batches = counted
+
+    def records(self):
+        return self.filtered()
+
+    def filtered(self):
+        pool = get_pool(self.workers)
+        pending = deque()
+        try:
+            for rids, records in self.batches():
+                pending.append((rids, pool.submit(filter_batch, self.spec, records)))
+                # results already back go up at once, a full pipeline waits
+                while pending and (len(pending)>=IN_FLIGHT*self.workers or pending[0][1].done()):
+                    rids, future = pending.popleft()
+                    for i,record in future.result():
+                        yield RID.unpack(rids[i])[0], record
+            while pending:
+                rids, future = pending.popleft()
+                for i,record in future.result():
+                    yield RID.unpack(rids[i])[0], record
+        finally:
+            for _,future in pending:
+                future.cancel()
+
+    def rows(self):
+        head, tail = [None]*self.off, [None]*(self.width-self.off-self.store.codec(self.tbl_name).ncols)
+        for _,record in self.filtered():
+            yield head+record+tail
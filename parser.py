@@ -1,641 +1,1837 @@
-import json
-from collections import OrderedDict
-import lark
-from bsddb3 import db
-
-cdb = db.DB()
-cdb.open('cdb.db', dbtype=db.DB_HASH, flags=db.DB_CREATE)
-
-class TableExistenceError(Exception):
-    pass
-class DuplicateColumnDefError(Exception):
-    pass
-class CharLengthError(Exception):
-    pass
-class DuplicatePrimaryKeyDefError(Exception):
-    pass
-class NonExistingColumnDefError(Exception):
-    pass
-class ReferenceTableExistenceError(Exception):
-    pass
-class ReferenceColumnExistenceError(Exception):
-    pass
-class ReferenceNonPrimaryKeyError(Exception):
-    pass
-class ReferenceTypeError(Exception):
-    pass
-class NoSuchTable(Exception):
-    pass
-class DropReferencedTableError(Exception):
-    pass
-class SelectTableExistenceError(Exception):
-    pass
-class InsertTypeMismatchError(Exception):
-    pass
-class InsertColumnNonNullableError(Exception):
-    pass
-class InsertColumnExistenceError(Exception):
-    pass
-class InsertDuplicatePrimaryKeyError(Exception):
-    pass
-class WhereIncomparableError(Exception):
-    pass
-class WhereTableNotSpecified(Exception):
-    pass
-class WhereColumnNotExist(Exception):
-    pass
-class InsertReferentialIntegrityError(Exception):
-    pass
-class DeleteReferentialIntegrityPassed(Exception):
-    pass
-class SelectColumnResolveError(Exception):
-    pass
-class WhereAmbiguousReference(Exception):
-    pass
-
-class Transformer(lark.Transformer):
-    def __init__(self):
-        super().__init__()
-        self.new_table = dict(cols=OrderedDict(), pks=set(), fors=OrderedDict(), invrefs=OrderedDict(), data=list())
-        self.add_invs = list()
-        self.queried_tbls = []
-        self.tbl_cols = {}
-
-    def clean(self):
-        self.new_table = dict(cols=OrderedDict(), pks=set(), fors=OrderedDict(), invrefs=OrderedDict(), data=list())
-        self.add_invs = list()
-        self.queried_tbls = []
-        self.tbl_cols = {}
-
-    def command(self, items):
-        if not isinstance(items[0], list):
-            cdb.close()
-            exit()
-        return items[0]
-
-    def query_list(self, items):
-        return items
-
-    def table_name(self, items):
-        return items[0].lower()
-    
-    def column_name(self, items):
-        return items[0].lower()
-
-    def create_table_query(self, items):
-        new_table_name = items[2]
-        if cdb.get(new_table_name.encode()) is not None:
-            print("Create table has failed: table with the same name already exists")
-            raise TableExistenceError
-        
-        self.new_table['pks'] = list(self.new_table['pks'])
-        table_info = json.dumps(self.new_table)
-        cdb.put(new_table_name.encode(), table_info.encode())
-
-        for ref_tbl_name,ref_cols,from_cols in self.add_invs:
-            ref_tbl = json.loads(cdb.get(ref_tbl_name.encode()),object_pairs_hook=OrderedDict)
-            invrefs = ref_tbl['invrefs']
-            for ref_col,from_col in zip(ref_cols,from_cols):
-                if ref_col not in invrefs:
-                    invrefs[ref_col] = [[new_table_name,from_col]]
-                else:
-                    invrefs[ref_col].append([ref_tbl_name,from_col])
-            cdb.put(ref_tbl_name.encode(), json.dumps(ref_tbl).encode())
-
-        print(f"'{new_table_name}' table is created")
-        return items
-
-    def table_element(self, items):
-        item = items[0]
-        cols = self.new_table['cols']
-
-        if item.data == 'column_definition':
-            col_info = item.children
-            col_name = str(col_info[0]).lower()
-            if col_name in cols:
-                print("Create table has failed: column definition is duplicated")
-                raise DuplicateColumnDefError
-
-            col_type = col_info[1].children
-            size = 0 # only for char
-            if col_type[0] == 'char':
-                size = int(col_type[2])
-                if size < 1:
-                    print("Char length should be over 0")
-                    raise CharLengthError
-
-            col_type = str(col_type[0])
-
-            not_null = (len(col_info)==4)
-            
-            cols[col_name] = [col_type, size, not_null, False, False]
-        
-        else: # table_constraint_definition
-            constraint_info = item.children[0]
-            if constraint_info.data == 'primary_key_constraint':
-                pks = self.new_table['pks']
-                if len(pks)!=0:
-                    print("Create table has failed: primary key definition is duplicated")
-                    raise DuplicatePrimaryKeyDefError
-                
-                pk_info = constraint_info.children[2].children[1:-1]
-                for col_name in pk_info:
-                    col_name = str(col_name).lower()
-                    if col_name not in cols:
-                        print(f"Create table has failed: '{col_name}' does not exists in column definition")
-                        raise NonExistingColumnDefError
-                    cols[col_name][2] = True
-                    cols[col_name][3] = True
-                    pks.add(col_name)
-
-            else: # referential_constraint
-                constraint_info = constraint_info.children
-                here_cols = list(map(str.lower,constraint_info[2].children[1:-1]))
-                ref_cols = list(map(str.lower,constraint_info[5].children[1:-1]))
-                ref_tbl_name = constraint_info[4]
-
-                for col_name in here_cols:
-                    if col_name not in cols:
-                        print(f"Create table has failed: '{col_name}' does not exists in column definition")
-                        raise NonExistingColumnDefError
-
-                if len(here_cols)!=len(ref_cols):
-                    print("Create table has failed: foreign key references wrong type")
-                    raise ReferenceTypeError
-                    
-                if (ref_tbl:=cdb.get(ref_tbl_name.encode())) is None:
-                    print("Create table has failed: foreign key references non existing table")
-                    raise ReferenceTableExistenceError
-                ref_tbl = json.loads(ref_tbl,object_pairs_hook=OrderedDict)
-                ref_pks = ref_tbl['pks']
-
-                fors = self.new_table['fors']
-                done = [False]*len(ref_pks)
-                for here_col_name, ref_col_name in zip(here_cols, ref_cols):
-                    if (ref_col:=ref_tbl['cols'].get(ref_col_name)) is None:
-                        print("Create table has failed: foreign key references non existing column")
-                        raise ReferenceColumnExistenceError
-
-                    here_col = cols[here_col_name]
-                    if ref_col[:2]!=here_col[:2]:
-                        print("Create table has failed: foreign key references wrong type")
-                        raise ReferenceTypeError
-
-                    if ref_col_name not in ref_pks:
-                        print("Create table has failed: foreign key references non primary key column")
-                        raise ReferenceNonPrimaryKeyError
-                    done[ref_pks.index(ref_col_name)] = True
-                    fors[here_col_name] = [ref_tbl_name, ref_col_name]
-                    cols[here_col_name][4] = True
-
-                for x in done:
-                    if not x:
-                        print("Create table has failed: foreign key references non primary key column")
-                        raise ReferenceNonPrimaryKeyError
-
-                self.add_invs.append([ref_tbl_name,ref_cols,here_cols])
-
-        return item
-
-    def drop_table_query(self, items):
-        tbl_name = items[2]
-
-        if (tbl:=cdb.get(tbl_name.encode())) is None:
-            print('No such table')
-            raise NoSuchTable
-
-        tbl = json.loads(tbl,object_pairs_hook=OrderedDict)
-        if len(tbl['invrefs'])!=0:
-            print(f"Drop table has failed: '{tbl_name}' is referenced by other table")
-            raise DropReferencedTableError
-        
-        cdb.delete(tbl_name.encode())
-        print(f"'{tbl_name}' table is dropped")
-        return items
-    
-    def desc_query(self, items):
-        tbl_name = items[1]
-
-        if (tbl:=cdb.get(tbl_name.encode())) is None:
-            print("No such table")
-            raise NoSuchTable
-        
-        tbl = json.loads(tbl,object_pairs_hook=OrderedDict)
-        print("-------------------------------------------------")
-        print(f'table_name [{tbl_name}]')
-        print(''.join(map(lambda x:str.ljust(x,20),['column_name', 'type', 'null', 'key'])))
-        for col_name, col_info in tbl['cols'].items():
-            c_type,size,not_null,pk,fk = col_info
-            if c_type=='char':
-                c_type = f'{c_type}({size})'
-            else:
-                c_type+='\t'
-            key = ''
-            if pk:
-                key+='PRI'
-            if fk:
-                if len(key)!=0:
-                    key+='/'
-                key+='FOR'
-            print(''.join(map(lambda x:str.ljust(x,20),[col_name, c_type, 'Y' if not_null else 'N', key])))
-        print("-------------------------------------------------")
-
-        return items
-
-    def show_tables_query(self, items):
-        cursor = cdb.cursor()
-        print("----------------")
-        while (kv:=cursor.next()) is not None:
-            tbl_name,_ = kv
-            print(tbl_name.decode())
-        print("----------------")
-        return items
-
-    def comparable_value(self, items):
-        return items[0]
-
-    def value(self, items):
-        return items[0]
-        
-    def value_list(self, items):
-        return items[2:-1]
-
-    def insert_columns_and_sources(self, items):
-        return items
-
-    def insert_query(self, items):
-        tbl_name = items[2]
-        cols=values=None
-        if len(items[3])==1:
-            values=items[3][0]
-        else:
-            cols,values=items[3]
-            cols = cols.children[1:-1]
-
-        if (tbl:=cdb.get(tbl_name.encode())) is None:
-            print("No such table")
-            raise NoSuchTable
-        tbl = json.loads(tbl,object_pairs_hook=OrderedDict)
-
-        if cols is not None:
-            for col_name in cols:
-                if col_name not in tbl['cols']:
-                    print(f"Insertion has failed: '{col_name}' does not exist")
-                    raise InsertColumnExistenceError
-
-            if len(cols)!=len(values):
-                print("Insertion has failed: Types are not matched")
-                raise InsertTypeMismatchError
-
-            order = {x:i for i,x in enumerate(tbl['cols'])}
-            values_ordered = [None]*len(tbl['cols'])
-            for col_name, value in zip(cols, values):
-                values_ordered[order[col_name]] = value
-            values = values_ordered
-            
-        else:
-            if len(values)!=len(tbl['cols']):
-                print("Insertion has failed: Types are not matched")
-                raise InsertTypeMismatchError
-
-        to_type = {'INT':'int', 'STR':'char', 'DATE':'date'}
-        for i,(value, (col_name,col_info)) in enumerate(zip(values, tbl['cols'].items())):
-            c_type,size,not_null,pk,fk = col_info
-            if (value is None) or (value.type=='NULL'):
-                value = None
-                if not_null:
-                    print(f"Insertion has failed: '{col_name}' is not nullable")
-                    raise InsertColumnNonNullableError
-            elif to_type[value.type]!=c_type:
-                print("Insertion has failed: Types are not matched")
-                raise InsertTypeMismatchError
-            else:
-                value = value.value
-
-            if (value is not None) and (c_type=='char'):
-                value = values[i][1:-1][:size]
-            if pk:
-                for record in tbl['data']:
-                    if record[i]==value:
-                        print("Insertion has failed: Primary key duplication")
-                        raise InsertDuplicatePrimaryKeyError
-            if fk:
-                ref_tbl_name,ref_col_name = tbl['fors'][col_name]
-                ref_tbl=cdb.get(ref_tbl_name.encode())
-                ref_tbl = json.loads(ref_tbl,object_pairs_hook=OrderedDict)
-                ref_ind = list(ref_tbl['cols']).index(ref_col_name)
-                present = False
-                for record in ref_tbl['data']:
-                    if record[ref_ind]==value:
-                        present = True
-                        break
-                if not present:
-                    print("Insertion has failed: Referential integrity violation")
-                    raise InsertReferentialIntegrityError
-            values[i] = value
-
-        tbl['data'].append(values)
-        table_info = json.dumps(tbl)
-        cdb.put(tbl_name.encode(), table_info.encode())
-        print("The row is inserted")
-
-        return items
-    
-    def comp_operand(self, items):
-        if len(items)==1:
-            return items[0]
-        return items
-
-    def get_val(self, record, tbl_col):
-        tbl,col = tbl_col if len(tbl_col)==2 else (None,tbl_col)
-        if (tbl is not None) and (tbl not in self.tbl_names):
-            print("Where clause try to reference tables which are not specified")
-            raise WhereTableNotSpecified
-        
-        if tbl is not None:
-            if (tbl,col) not in self.tbl_cols:
-                print("Where clause try to reference non existing column")
-                raise WhereColumnNotExist
-        else:
-            col_cnt = 0
-            for tbl_name,col_name in self.tbl_cols:
-                if col_name==col:
-                    col_cnt+=1; tbl=tbl_name 
-            if col_cnt>1:
-                print("Where clause contains ambiguous reference")
-                raise WhereAmbiguousReference
-            if col_cnt==0:
-                print("Where clause try to reference non existing column")
-                raise WhereColumnNotExist
-
-        val = record[list(self.tbl_cols).index((tbl,col))]
-        if val is None: return None
-        return [self.tbl_cols[(tbl,col)][0], val]
-
-    def check(self, record, cond):
-        if cond.data=='boolean_expr':
-            result = False
-            for boolean_term in cond.children[::2]:
-                if self.check(record, boolean_term) is True:
-                    return True
-                if self.check(record, boolean_term) is None:
-                    result = None
-            return result
-
-        elif cond.data=='boolean_term':
-            result = True
-            for boolean_factor in cond.children[::2]:
-                if self.check(record, boolean_factor) is False:
-                    return False
-                if self.check(record, boolean_factor) is None:
-                    result = None
-            return result
-
-        elif cond.data=='boolean_factor':
-            if len(cond.children)==1:
-                return self.check(record, cond.children[0].children[0])
-            else:
-                result = self.check(record, cond.children[1].children[0])
-                if result is None:
-                    return None
-                else:
-                    return not result
-
-        elif cond.data=='parenthesized_boolean_expr':
-            return self.check(record, cond.children[1])
-
-        elif cond.data=='predicate':
-            return self.check(record, cond.children[0])
-
-        elif cond.data=='comparison_predicate':
-            lo = cond.children[0]
-            op = cond.children[1].value
-            ro = cond.children[2]
-            if type(cond.children[0])!=lark.lexer.Token:
-                lo = self.get_val(record, cond.children[0])
-                if lo is None:
-                    return None
-            else:
-                lo=[lo.type.lower(),lo.value]   
-            if type(cond.children[2])!=lark.lexer.Token:
-                ro = self.get_val(record, cond.children[2])
-                if lo is None:
-                    return None
-            else:
-                ro=[ro.type.lower(),ro.value]
-
-            if lo[0]=='str': lo[0],lo[1]='char',lo[1][1:-1]
-            if ro[0]=='str': ro[0],ro[1]='char',ro[1][1:-1]
-            if lo[0]!=ro[0]:
-                print("Where clause try to compare incomparable values")
-                raise WhereIncomparableError
-
-            lo,ro = lo[1],ro[1]
-            if (op=='<'): return lo<ro
-            elif (op=='>'): return lo>ro
-            elif (op=='='): return lo==ro
-            elif (op=='>='): return lo>=ro
-            elif (op=='<='): return lo<=ro
-            else: return lo!=ro
-
-        elif cond.data=='null_predicate':
-            tbl_col = cond.children[:-1]
-            if len(tbl_col)==1: tbl_col=tbl_col[0]
-            val = (self.get_val(record, tbl_col) is None)
-            if len(cond.children[-1].children)==3: val = not val
-            return val
-    
-    def inv_ref(self, record, cols, invrefs):
-        for col,col_name in zip(record,cols):
-            if (ref_info:=invrefs.get(col_name)) is None:
-                continue
-            for ref_tbl_name,ref_col_name in ref_info:
-                ref_tbl = json.loads(cdb.get(ref_tbl_name.encode()),object_pairs_hook=OrderedDict)
-                ref_ind = list(ref_tbl['cols']).index(ref_col_name)
-                for ref_rec in ref_tbl['data']:
-                    if ref_rec[ref_ind]==col:
-                        return True
-        return False
-
-    def delete_query(self, items):
-        tbl_name = items[2]
-
-        if (tbl:=cdb.get(tbl_name.encode())) is None:
-            print('No such table')
-            raise NoSuchTable
-        tbl=json.loads(tbl,object_pairs_hook=OrderedDict)
-
-        if len(items)==3:
-            print(f"{len(tbl['data'])} row(s) are deleted")
-            tbl['data']=[]
-            table_info = json.dumps(tbl)
-            cdb.put(tbl_name.encode(), table_info.encode())
-        
-        else:
-            self.queried_tbls = [tbl_name]
-            self.tbl_cols = {(tbl_name,col_name):col_info for col_name,col_info in tbl['cols'].items()}
-
-            new_data = []
-            cond = items[3].children[1]
-            count = 0
-            inv_refs = 0
-            for record in tbl['data']:
-                if self.check(record, cond) is True:
-                    if self.inv_ref(record,tbl['cols'],tbl['invrefs']):
-                        inv_refs+=1
-                    else:
-                        count+=1; continue
-                new_data.append(record)
-
-            tbl['data']=new_data
-            table_info = json.dumps(tbl)
-            cdb.put(tbl_name.encode(), table_info.encode())
-            print(f"{count} row(s) are deleted")
-            if inv_refs!=0:
-                print(f"{inv_refs} row(s) are not deleted due to referential integrity")
-                raise DeleteReferentialIntegrityPassed
-
-        return items
-
-    def select_list(self, items):
-        return items
-
-    def table_expression(self, items):
-        if len(items)==2:
-            items[1] = items[1].children[1]
-        return items
-
-    def from_clause(self, items):
-        return items[1]
-
-    def table_reference_list(self, items):
-        return items
-
-    def referred_table(self, items):
-        return items[0]
-
-    def add_recs(self, sel_recs, tbls, curr):
-        if len(tbls)==0:
-            sel_recs.append(curr)
-            return
-        for record in tbls[0]['data']:
-            self.add_recs(sel_recs, tbls[1:], curr+record)
-
-    def selected_column(self, items):
-        return items
-
-    def select_query(self, items):
-        tbl_names = items[2][0]
-        sel_tbl_cols = {}
-        tbls = []
-        for tbl_name in tbl_names:
-            if (tbl:=cdb.get(tbl_name.encode())) is None:
-                print(f"Selection has failed: '{tbl_name}' does not exist")
-                raise SelectTableExistenceError
-            tbl = json.loads(tbl)
-            tbls.append(tbl)
-            for col_name,col_info in tbl['cols'].items():
-                sel_tbl_cols[(tbl_name,col_name)] = col_info
-        
-        sel_recs = []
-        self.add_recs(sel_recs,tbls,[])
-        
-        if len(items[2])!=1:
-            self.queried_tbls = tbl_names
-            self.tbl_cols = sel_tbl_cols
-
-            new_sel_recs = []
-            for record in sel_recs:
-                if self.check(record, items[2][1]) is not True:
-                    continue
-                new_sel_recs.append(record)
-            sel_recs = new_sel_recs
-
-        if len(items[1])!=0:
-            sel_order = []
-            renames = []
-            for i,sel_tbl_col in enumerate(items[1]):
-                if len(sel_tbl_col)==2:
-                    sel_tbl,sel_col=sel_tbl_col
-                elif len(sel_tbl_col)>=3 and type(sel_tbl_col[-2])==lark.lexer.Token:
-                    if len(sel_tbl_col)==3:
-                        sel_tbl,(sel_col,_,sel_as)=None,sel_tbl_col
-                    else:
-                        sel_tbl,sel_col,_,sel_as=sel_tbl_col
-                    renames.append((i,sel_as))
-                else:
-                    sel_tbl=None; sel_col=sel_tbl_col[0]
-
-                if sel_tbl is not None:
-                    if (sel_tbl not in tbl_names) or ((sel_tbl,sel_col) not in sel_tbl_cols):
-                        print(f"Selection has failed: fail to resolve '{sel_tbl+'.'+sel_col}'")
-                        raise SelectColumnResolveError
-                    sel_order.append(list(sel_tbl_cols).index((sel_tbl,sel_col)))
-                else:
-                    col_cnt = 0
-                    sel_tbl = None
-                    for tbl_name,col_name in sel_tbl_cols:
-                        if col_name==sel_col:
-                            col_cnt+=1; sel_tbl = tbl_name
-                    if col_cnt!=1:
-                        print(f"Selection has failed: fail to resolve '{sel_col}'")
-                        raise SelectColumnResolveError
-                    else:
-                        sel_order.append(list(sel_tbl_cols).index((sel_tbl,sel_col)))
-
-            sel_tbl_cols = list(sel_tbl_cols)
-            sel_tbl_cols = [sel_tbl_cols[i] for i in sel_order]
-            for i,sel_as in renames:
-                sel_tbl_cols[i] = [sel_tbl_cols[i][0],sel_as]
-            new_sel_recs = []
-            for record in sel_recs:
-                new_sel_recs.append([record[i] for i in sel_order])
-            sel_recs = new_sel_recs
-
-        div = "+-"
-        lens = []
-        ncols = len(sel_tbl_cols)
-        for i,(_,col_name) in enumerate(sel_tbl_cols):
-            lens.append(len(col_name))
-            div += '-'*len(col_name)
-            if i!=ncols-1:
-                div += "-+-"
-        div += "-+"
-
-        print(div)
-        print("| ",end=""); print(" | ".join([col_name for (_,col_name) in sel_tbl_cols]), end=""); print(" |")
-        print(div)
-        for record in sel_recs:
-            print("| ",end="")
-            for col,col_space in zip(record,lens):
-                print(str(col).ljust(col_space),end=' | ')
-            print()
-        print(div)
-            
-        return items
-
-def input_queries(prompt):
-    s = input(prompt)
-    if not s.strip():
-        return []
-    while not s.rstrip().endswith(';'):
-        s += '\n' + input()
-    return [x + ';' for x in s.split(';')[:-1]]
-
-if __name__ == "__main__":
-    prompt = "DB_example> "
-
-    with open('grammar.lark') as file:
-        parser = lark.Lark(file.read(), start="command", lexer='standard')
-    transformer = Transformer()
-
-    while True:
-        for query in input_queries(prompt):
-            try:
-                tree = parser.parse(query)
-                transformer.clean()
-                msg = transformer.transform(tree)[0]
-            except Exception as e:
-                if isinstance(e, lark.exceptions.UnexpectedInput):
-                    print(prompt + "Syntax error")
+from collections import OrderedDict
+import argparse
+import os
+import csv
+import json
+import re
+import operator
+import time
+import lark
+from storage import Storage, INT_MIN, INT_MAX, encode_key
+from executor import Scan, HashJoin, IndexJoin, CrossJoin, Filter, Project, Limit, HashAggregate, RowCount, Sort, SORT_MEMORY
+from columnar import ColumnarScan, compare, mask_and, mask_or, scalar, np
+from render import render, FORMATS
+from cache import ResultCache
+from profiling import Profile, SlowLog, SLOW_MS
+from parallel import ParallelScan, PARALLEL_MIN_ROWS
+import stats
+
+class TableExistenceError(Exception):
+    pass
+class DuplicateColumnDefError(Exception):
+    pass
+class CharLengthError(Exception):
+    pass
+class DuplicatePrimaryKeyDefError(Exception):
+    pass
+class NonExistingColumnDefError(Exception):
+    pass
+class ReferenceTableExistenceError(Exception):
+    pass
+class ReferenceColumnExistenceError(Exception):
+    pass
+class ReferenceNonPrimaryKeyError(Exception):
+    pass
+class ReferenceTypeError(Exception):
+    pass
+class NoSuchTable(Exception):
+    pass
+class DropReferencedTableError(Exception):
+    pass
+class SelectTableExistenceError(Exception):
+    pass
+class InsertTypeMismatchError(Exception):
+    pass
+class InsertColumnNonNullableError(Exception):
+    pass
+class InsertColumnExistenceError(Exception):
+    pass
+class InsertDuplicatePrimaryKeyError(Exception):
+    pass
+class WhereIncomparableError(Exception):
+    pass
+class WhereTableNotSpecified(Exception):
+    pass
+class WhereColumnNotExist(Exception):
+    pass
+class InsertReferentialIntegrityError(Exception):
+    pass
+class DeleteReferentialIntegrityPassed(Exception):
+    pass
+class UpdateColumnExistenceError(Exception):
+    pass
+class UpdateTypeMismatchError(Exception):
+    pass
+class UpdateColumnNonNullableError(Exception):
+    pass
+class UpdateDuplicatePrimaryKeyError(Exception):
+    pass
+class UpdateReferentialIntegrityError(Exception):
+    pass
+class UpdateSetError(Exception):
+    pass
+class SelectColumnResolveError(Exception):
+    pass
+class WhereAmbiguousReference(Exception):
+    pass
+class LoadFileError(Exception):
+    pass
+class ParameterBindingError(Exception):
+    pass
+class TransactionStateError(Exception):
+    pass
+class IndexExistenceError(Exception):
+    pass
+class IndexNameError(Exception):
+    pass
+class NoSuchIndex(Exception):
+    pass
+class DropIndexError(Exception):
+    pass
+class SelectGroupByError(Exception):
+    pass
+class SelectAggregateTypeError(Exception):
+    pass
+class WhereAggregateError(Exception):
+    pass
+
+# what a value that does not fit its column raises: a type mismatch, a null in a
+# not null column
+INSERT_ERRORS = (InsertTypeMismatchError, InsertColumnNonNullableError)
+UPDATE_ERRORS = (UpdateTypeMismatchError, UpdateColumnNonNullableError)
+FLIPPED_OPS = {'<':'>', '>':'<', '=':'=', '>=':'<=', '<=':'>=', '!=':'!='}
+COMP_OPS = {'<':operator.lt, '>':operator.gt, '=':operator.eq, '>=':operator.ge, '<=':operator.le, '!=':operator.ne}
+DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}', re.ASCII)
+TOKEN_TYPES = {'INT':'int', 'STR':'char', 'DATE':'date'}
+LOAD_BATCH = 10000
+# probing an index one key at a time pays until there are more than 1/PROBE_RATIO
+# of its rows to probe (rows being deleted, outer rows of a join); past that one
+# walk of the index, or one scan of the table, is cheaper
+PROBE_RATIO = 16
+
+def read_csv(path):
+    with open(path, newline='') as file:
+        for row in csv.reader(file):
+            yield [None if value=='' else value for value in row]
+
+def read_jsonl(path):
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+LOAD_FORMATS = {'csv':read_csv, 'jsonl':read_jsonl, 'ndjson':read_jsonl, 'json':read_jsonl}
+
+class Transformer(lark.Transformer):
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        # filtered sequential scans run over numpy arrays when numpy is installed
+        self.columnar = np is not None
+        # pool processes filtered scans of large tables are spread over; 0 or 1
+        # scans in the session
+        self.parallel = 0
+        self.sort_memory = SORT_MEMORY
+        # how select prints its rows: table, csv, tsv or jsonl
+        self.output = 'table'
+        # a ResultCache for select, none by default; sessions may share one
+        self.cache = None
+        # print the time of every statement (\timing), and log the slow ones
+        self.timing = False
+        self.slow_log = None
+        self.profile = None
+        # where COPY may read files: anywhere when None, under this directory
+        # otherwise, and nowhere when it is empty (a server given no directory)
+        self.copy_dir = None
+        self.new_table = dict(cols=OrderedDict(), pks=list(), fors=OrderedDict(), invrefs=OrderedDict(), indexes=OrderedDict())
+        self.add_invs = list()
+        self.queried_tbls = []
+        self.tbl_cols = {}
+        self.tbl_offs = {}
+        self.params = None
+        self.param_count = 0
+        self.aggs = None
+        self.group_offs = {}
+
+    def clean(self, sql=None):
+        self.new_table = dict(cols=OrderedDict(), pks=list(), fors=OrderedDict(), invrefs=OrderedDict(), indexes=OrderedDict())
+        self.add_invs = list()
+        self.queried_tbls = []
+        self.tbl_cols = {}
+        self.tbl_offs = {}
+        self.params = None
+        self.param_count = 0
+        self.aggs = None
+        self.group_offs = {}
+        self.profile = Profile(self.store, sql) if self.timing or self.slow_log is not None else None
+
+    def mark_phase(self, name):
+        if self.profile is not None:
+            self.profile.phase(name)
+
+    def end_profile(self):
+        if (profile:=self.profile) is None:
+            return
+        self.profile = None
+        profile.finish()
+        if self.timing:
+            print(profile.summary())
+        if self.slow_log is not None:
+            self.slow_log.write(profile)
+
+    def command(self, items):
+        if not isinstance(items[0], list):
+            self.store.close()
+            exit()
+        return items[0]
+
+    def query_list(self, items):
+        self.end_profile()
+        return items
+
+    def table_name(self, items):
+        return items[0].lower()
+    
+    def column_name(self, items):
+        return items[0].lower()
+
+    def index_name(self, items):
+        return items[0].lower()
+
+    def create_table_query(self, items):
+        new_table_name = items[2]
+        if self.store.get_table(new_table_name) is not None:
+            print("Create table has failed: table with the same name already exists")
+            raise TableExistenceError
+        
+        if len(self.new_table['pks'])!=0:
+            self.new_table['indexes']['pk'] = dict(cols=self.new_table['pks'], unique=True)
+        self.store.create_table(new_table_name, self.new_table)
+
+        for ref_tbl_name,ref_cols,from_cols in self.add_invs:
+            ref_tbl = self.store.get_table(ref_tbl_name)
+            invrefs = ref_tbl['invrefs']
+            for ref_col,from_col in zip(ref_cols,from_cols):
+                if ref_col not in invrefs:
+                    invrefs[ref_col] = [[new_table_name,from_col]]
+                else:
+                    invrefs[ref_col].append([new_table_name,from_col])
+            self.store.put_table(ref_tbl_name, ref_tbl)
+
+        print(f"'{new_table_name}' table is created")
+        return items
+
+    def table_element(self, items):
+        item = items[0]
+        cols = self.new_table['cols']
+
+        if item.data == 'column_definition':
+            col_info = item.children
+            col_name = str(col_info[0]).lower()
+            if col_name in cols:
+                print("Create table has failed: column definition is duplicated")
+                raise DuplicateColumnDefError
+
+            col_type = col_info[1].children
+            size = 0 # only for char
+            if col_type[0] == 'char':
+                size = int(col_type[2])
+                if size < 1:
+                    print("Char length should be over 0")
+                    raise CharLengthError
+
+            col_type = str(col_type[0])
+
+            not_null = (len(col_info)==4)
+            
+            cols[col_name] = [col_type, size, not_null, False, False]
+        
+        else: # table_constraint_definition
+            constraint_info = item.children[0]
+            if constraint_info.data == 'primary_key_constraint':
+                pks = self.new_table['pks']
+                if len(pks)!=0:
+                    print("Create table has failed: primary key definition is duplicated")
+                    raise DuplicatePrimaryKeyDefError
+                
+                pk_info = constraint_info.children[2].children[1:-1]
+                for col_name in pk_info:
+                    col_name = str(col_name).lower()
+                    if col_name not in cols:
+                        print(f"Create table has failed: '{col_name}' does not exists in column definition")
+                        raise NonExistingColumnDefError
+                    cols[col_name][2] = True
+                    cols[col_name][3] = True
+                    if col_name not in pks:
+                        pks.append(col_name)
+
+            else: # referential_constraint
+                constraint_info = constraint_info.children
+                here_cols = list(map(str.lower,constraint_info[2].children[1:-1]))
+                ref_cols = list(map(str.lower,constraint_info[5].children[1:-1]))
+                ref_tbl_name = constraint_info[4]
+
+                for col_name in here_cols:
+                    if col_name not in cols:
+                        print(f"Create table has failed: '{col_name}' does not exists in column definition")
+                        raise NonExistingColumnDefError
+
+                if len(here_cols)!=len(ref_cols):
+                    print("Create table has failed: foreign key references wrong type")
+                    raise ReferenceTypeError
+                    
+                if (ref_tbl:=self.store.get_table(ref_tbl_name)) is None:
+                    print("Create table has failed: foreign key references non existing table")
+                    raise ReferenceTableExistenceError
+                ref_pks = ref_tbl['pks']
+
+                fors = self.new_table['fors']
+                done = [False]*len(ref_pks)
+                for here_col_name, ref_col_name in zip(here_cols, ref_cols):
+                    if (ref_col:=ref_tbl['cols'].get(ref_col_name)) is None:
+                        print("Create table has failed: foreign key references non existing column")
+                        raise ReferenceColumnExistenceError
+
+                    here_col = cols[here_col_name]
+                    if ref_col[:2]!=here_col[:2]:
+                        print("Create table has failed: foreign key references wrong type")
+                        raise ReferenceTypeError
+
+                    if ref_col_name not in ref_pks:
+                        print("Create table has failed: foreign key references non primary key column")
+                        raise ReferenceNonPrimaryKeyError
+                    done[ref_pks.index(ref_col_name)] = True
+                    fors[here_col_name] = [ref_tbl_name, ref_col_name]
+                    cols[here_col_name][4] = True
+
+                for x in done:
+                    if not x:
+                        print("Create table has failed: foreign key references non primary key column")
+                        raise ReferenceNonPrimaryKeyError
+
+                # probed with the referenced table's primary key, so keep its column order
+                indexes = self.new_table['indexes']
+                idx_name = f'fk_{ref_tbl_name}'
+                n = 1
+                while idx_name in indexes:
+                    n+=1; idx_name = f'fk_{ref_tbl_name}_{n}'
+                fk_cols = [here_cols[ref_cols.index(ref_pk)] for ref_pk in ref_pks]
+                indexes[idx_name] = dict(cols=fk_cols, unique=False, ref=ref_tbl_name)
+
+                self.add_invs.append([ref_tbl_name,ref_cols,here_cols])
+
+        return item
+
+    def drop_table_query(self, items):
+        tbl_name = items[2]
+
+        if (tbl:=self.store.get_table(tbl_name)) is None:
+            print('No such table')
+            raise NoSuchTable
+
+        if len(tbl['invrefs'])!=0:
+            print(f"Drop table has failed: '{tbl_name}' is referenced by other table")
+            raise DropReferencedTableError
+        
+        for idx in tbl['indexes'].values():
+            if (ref_tbl_name:=idx.get('ref')) is None:
+                continue
+            ref_tbl = self.store.get_table(ref_tbl_name)
+            invrefs = ref_tbl['invrefs']
+            for ref_col in list(invrefs):
+                invrefs[ref_col] = [ref for ref in invrefs[ref_col] if ref[0]!=tbl_name]
+                if len(invrefs[ref_col])==0:
+                    del invrefs[ref_col]
+            self.store.put_table(ref_tbl_name, ref_tbl)
+        self.store.drop_table(tbl_name, tbl)
+        print(f"'{tbl_name}' table is dropped")
+        return items
+    
+    def find_index(self, idx_name):
+        # names of created indexes are unique, the pk and fk_ names of key indexes
+        # repeat across tables; a created index wins over a key index
+        found = (None, None)
+        for tbl_name in self.store.table_names():
+            if (idx:=(tbl:=self.store.get_table(tbl_name))['indexes'].get(idx_name)) is None:
+                continue
+            if idx_name!='pk' and 'ref' not in idx:
+                return tbl_name, tbl
+            if found[1] is None:
+                found = (tbl_name, tbl)
+        return found
+
+    def create_index_query(self, items):
+        idx_name, tbl_name = items[2], items[4]
+        cols = items[5].children[1:-1]
+        if (tbl:=self.store.get_table(tbl_name)) is None:
+            print("No such table")
+            raise NoSuchTable
+        if idx_name=='pk' or idx_name.startswith('fk_'):
+            print("Create index has failed: 'pk' and names starting with 'fk_' are kept for key indexes")
+            raise IndexNameError
+        if self.find_index(idx_name)[0] is not None:
+            print("Create index has failed: index with the same name already exists")
+            raise IndexExistenceError
+        for i,col_name in enumerate(cols):
+            if col_name not in tbl['cols']:
+                print(f"Create index has failed: '{col_name}' does not exists in column definition")
+                raise NonExistingColumnDefError
+            if col_name in cols[:i]:
+                print("Create index has failed: column definition is duplicated")
+                raise DuplicateColumnDefError
+        self.store.create_index(tbl_name, tbl, idx_name, cols)
+        print(f"'{idx_name}' index is created")
+        return items
+
+    def drop_index_query(self, items):
+        idx_name = items[2]
+        tbl_name, tbl = self.find_index(idx_name)
+        if tbl is None:
+            print("No such index")
+            raise NoSuchIndex
+        if idx_name=='pk' or 'ref' in tbl['indexes'][idx_name]:
+            print(f"Drop index has failed: '{idx_name}' is used by a key constraint")
+            raise DropIndexError
+        self.store.drop_index(tbl_name, tbl, idx_name)
+        print(f"'{idx_name}' index is dropped")
+        return items
+
+    def desc_query(self, items):
+        tbl_name = items[1]
+
+        if (tbl:=self.store.get_table(tbl_name)) is None:
+            print("No such table")
+            raise NoSuchTable
+        
+        print("-------------------------------------------------")
+        print(f'table_name [{tbl_name}]')
+        print(''.join(map(lambda x:str.ljust(x,20),['column_name', 'type', 'null', 'key'])))
+        for col_name, col_info in tbl['cols'].items():
+            c_type,size,not_null,pk,fk = col_info
+            if c_type=='char':
+                c_type = f'{c_type}({size})'
+            else:
+                c_type+='\t'
+            key = ''
+            if pk:
+                key+='PRI'
+            if fk:
+                if len(key)!=0:
+                    key+='/'
+                key+='FOR'
+            print(''.join(map(lambda x:str.ljust(x,20),[col_name, c_type, 'Y' if not_null else 'N', key])))
+        print("-------------------------------------------------")
+
+        return items
+
+    def show_tables_query(self, items):
+        print("----------------")
+        for tbl_name in self.store.table_names():
+            print(tbl_name)
+        print("----------------")
+        return items
+
+    def analyze_query(self, items):
+        tbl_names = items[1:] or self.store.table_names()
+        for tbl_name in tbl_names:
+            if (tbl:=self.store.get_table(tbl_name)) is None:
+                print("No such table")
+                raise NoSuchTable
+            tbl['stats'] = stats.gather(self.store, tbl_name, tbl)
+            self.store.put_table(tbl_name, tbl)
+            print(f"'{tbl_name}' is analyzed")
+        return items
+
+    def show_stats_query(self, items):
+        tbl_name = items[2]
+
+        if (tbl:=self.store.get_table(tbl_name)) is None:
+            print("No such table")
+            raise NoSuchTable
+
+        print("-------------------------------------------------")
+        print(f'table_name [{tbl_name}]')
+        if (tbl_stats:=tbl.get('stats')) is None:
+            print(f"rows {self.store.row_count(tbl_name)}, not analyzed")
+        else:
+            print(f"rows {self.store.row_count(tbl_name)}, {tbl_stats['rows']} when analyzed")
+            print(''.join(map(lambda x:str.ljust(x,20),['column_name', 'distinct', 'null_frac', 'min', 'max'])))
+            for col_name,col in tbl_stats['cols'].items():
+                print(''.join(map(lambda x:str.ljust(str(x),20),[col_name, col['distinct'], f"{col['nulls']:.4f}", col['min'], col['max']])))
+            for col_name,col in tbl_stats['cols'].items():
+                if col['hist']:
+                    print(f"{col_name}: " + ' | '.join(map(str, col['hist'])))
+        print("-------------------------------------------------")
+
+        return items
+
+    def comparable_value(self, items):
+        if items[0].type=='PARAM':
+            # numbered in the order the placeholders appear in the statement
+            self.param_count += 1
+            return lark.lexer.Token('PARAM', self.param_count-1)
+        return items[0]
+
+    def value(self, items):
+        return items[0]
+        
+    def value_list(self, items):
+        return items[1:]
+
+    def row_value(self, items):
+        return items[1:-1]
+
+    def insert_columns_and_sources(self, items):
+        return items
+
+    def param(self, token):
+        if self.params is None or token.value>=len(self.params):
+            print("Query has failed: parameter is not bound")
+            raise ParameterBindingError
+        return self.params[token.value]
+
+    def insert_source(self, source):
+        if len(source)==1:
+            return None, source[0]
+        return source[0].children[1:-1], source[1]
+
+    def insert_query(self, items):
+        self.mark_phase('parse')
+        self.insert_rows(items[2], *self.insert_source(items[3]))
+        return items
+
+    def insert_rows(self, tbl_name, cols, rows):
+        if (tbl:=self.store.get_table(tbl_name)) is None:
+            print("No such table")
+            raise NoSuchTable
+
+        offs = self.store.offsets(tbl_name)
+        ncols = len(offs)
+        if cols is not None:
+            for col_name in cols:
+                if col_name not in offs:
+                    print(f"Insertion has failed: '{col_name}' does not exist")
+                    raise InsertColumnExistenceError
+            positions = [offs[col_name] for col_name in cols]
+
+        records = []
+        for values in rows:
+            if cols is not None:
+                if len(cols)!=len(values):
+                    print("Insertion has failed: Types are not matched")
+                    raise InsertTypeMismatchError
+                values_ordered = [None]*ncols
+                for i, value in zip(positions, values):
+                    values_ordered[i] = value
+                values = values_ordered
+            elif len(values)!=ncols:
+                print("Insertion has failed: Types are not matched")
+                raise InsertTypeMismatchError
+
+            records.append([self.token_value(value, col_name, col_info, "Insertion has failed") for value, (col_name,col_info) in zip(values, tbl['cols'].items())])
+
+        # keys are checked for the whole statement before anything is written
+        if 'pk' in tbl['indexes']:
+            pk_inds = [offs[col_name] for col_name in tbl['pks']]
+            seen = set()
+            for record in records:
+                pk_values = [record[i] for i in pk_inds]
+                if tuple(pk_values) in seen or next(self.store.index_lookup(tbl_name, tbl, 'pk', pk_values), None) is not None:
+                    print("Insertion has failed: Primary key duplication")
+                    raise InsertDuplicatePrimaryKeyError
+                seen.add(tuple(pk_values))
+
+        for idx in tbl['indexes'].values():
+            if (ref_tbl_name:=idx.get('ref')) is None:
+                continue
+            ref_tbl = self.store.get_table(ref_tbl_name)
+            fk_inds = [offs[col_name] for col_name in idx['cols']]
+            present = set()
+            for record in records:
+                fk_values = [record[i] for i in fk_inds]
+                if tuple(fk_values) in present:
+                    continue
+                if None in fk_values or next(self.store.index_lookup(ref_tbl_name, ref_tbl, 'pk', fk_values), None) is None:
+                    print("Insertion has failed: Referential integrity violation")
+                    raise InsertReferentialIntegrityError
+                present.add(tuple(fk_values))
+
+        self.store.insert_rows(tbl_name, tbl, records)
+        if len(records)==1:
+            print("The row is inserted")
+        else:
+            print(f"{len(records)} rows are inserted")
+        return len(records)
+    
+    def load_file(self, tbl_name, path, fmt=None):
+        # csv fields are positional unless the first line names the columns;
+        # json lines are either lists (positional) or objects keyed by column
+        fmt = (fmt or path.rsplit('.', 1)[-1]).lower()
+        if self.copy_dir is not None:
+            if not self.copy_dir:
+                print("Load has failed: reading files is disabled")
+                raise LoadFileError
+            root = os.path.realpath(self.copy_dir)
+            path = os.path.realpath(os.path.join(root, path))
+            if os.path.commonpath([root, path])!=root:
+                print("Load has failed: the file is outside the data directory")
+                raise LoadFileError
+        if fmt not in LOAD_FORMATS:
+            print(f"Load has failed: unknown format '{fmt}'")
+            raise LoadFileError
+        try:
+            rows = LOAD_FORMATS[fmt](path)
+            first = next(rows, None)
+        except (OSError, ValueError, csv.Error):
+            print(f"Load has failed: cannot read '{path}'")
+            raise LoadFileError
+        cols = None
+        if fmt=='csv' and first is not None and (tbl:=self.store.get_table(tbl_name)) is not None:
+            if all(value is not None and value.strip().lower() in tbl['cols'] for value in first):
+                cols = [value.strip().lower() for value in first]
+                first = None
+        if first is not None:
+            rows = (row for rows in ([first], rows) for row in rows)
+        try:
+            return self.load_rows(tbl_name, rows, cols)
+        except (OSError, ValueError, csv.Error):
+            print(f"Load has failed: cannot read '{path}'")
+            raise LoadFileError
+
+    def token_value(self, value, col_name, col_info, fail, errors=INSERT_ERRORS):
+        # a literal or placeholder of the statement, checked against its column
+        c_type,size,not_null,pk,fk = col_info
+        if (value is not None) and (value.type=='PARAM'):
+            return self.convert_value(self.param(value), col_name, col_info, fail, errors)
+        if (value is None) or (value.type=='NULL'):
+            if not_null:
+                print(f"{fail}: '{col_name}' is not nullable")
+                raise errors[1]
+            return None
+        if TOKEN_TYPES[value.type]!=c_type:
+            print(f"{fail}: Types are not matched")
+            raise errors[0]
+        if c_type=='char':
+            return value[1:-1][:size]
+        if c_type=='int':
+            value = int(value)
+            if not (INT_MIN<=value<=INT_MAX):
+                print(f"{fail}: Types are not matched")
+                raise errors[0]
+            return value
+        return value.value
+
+    def convert_value(self, value, col_name, col_info, fail, errors=INSERT_ERRORS):
+        # python values, as bound to placeholders or read by a bulk load
+        c_type,size,not_null,_,_ = col_info
+        if value is None:
+            if not_null:
+                print(f"{fail}: '{col_name}' is not nullable")
+                raise errors[1]
+            return None
+        if c_type=='int':
+            if isinstance(value, str):
+                try:
+                    value = int(value)
+                except ValueError:
+                    pass
+            if isinstance(value, int) and not isinstance(value, bool) and INT_MIN<=value<=INT_MAX:
+                return value
+        elif isinstance(value, str):
+            if c_type=='char':
+                return value[:size]
+            if DATE_RE.fullmatch(value):
+                return value
+        print(f"{fail}: Types are not matched")
+        raise errors[0]
+
+    def load_rows(self, tbl_name, rows, cols=None):
+        # python values (or csv text) are validated in batches; key constraints are
+        # checked against sets read once per load; a failed load is rolled back
+        # with the statement's transaction
+        if (tbl:=self.store.get_table(tbl_name)) is None:
+            print("No such table")
+            raise NoSuchTable
+        offs = self.store.offsets(tbl_name)
+        order = list(offs)
+        col_infos = list(tbl['cols'].items())
+        if cols is not None:
+            for col_name in cols:
+                if col_name not in offs:
+                    print(f"Load has failed: '{col_name}' does not exist")
+                    raise InsertColumnExistenceError
+            positions = [offs[col_name] for col_name in cols]
+
+        pk_inds = [offs[col_name] for col_name in tbl['pks']]
+        pk_seen = set(self.store.scan_columns(tbl_name, tbl['pks'])) if pk_inds else None
+        fks = []
+        for idx in tbl['indexes'].values():
+            if (ref_tbl_name:=idx.get('ref')) is None:
+                continue
+            ref_tbl = self.store.get_table(ref_tbl_name)
+            ref_keys = set(self.store.scan_columns(ref_tbl_name, ref_tbl['pks']))
+            fks.append(([offs[col_name] for col_name in idx['cols']], ref_keys))
+
+        def check_batch(batch):
+            out = []
+            for line,row in batch:
+                if not isinstance(row, (list, dict)):
+                    print(f"Load has failed: line {line}: Types are not matched")
+                    raise InsertTypeMismatchError
+                if isinstance(row, dict):
+                    for col_name in row:
+                        if col_name.lower() not in tbl['cols']:
+                            print(f"Load has failed: line {line}: '{col_name}' does not exist")
+                            raise InsertColumnExistenceError
+                    row = {col_name.lower():value for col_name,value in row.items()}
+                    row = [row.get(col_name) for col_name in order]
+                elif cols is not None:
+                    if len(row)!=len(cols):
+                        print(f"Load has failed: line {line}: Types are not matched")
+                        raise InsertTypeMismatchError
+                    values = [None]*len(order)
+                    for i,value in zip(positions, row):
+                        values[i] = value
+                    row = values
+                if len(row)!=len(order):
+                    print(f"Load has failed: line {line}: Types are not matched")
+                    raise InsertTypeMismatchError
+                fail = f"Load has failed: line {line}"
+                out.append([self.convert_value(value, col_name, col_info, fail) for value,(col_name,col_info) in zip(row, col_infos)])
+
+            for (line,_),row in zip(batch, out):
+                if pk_seen is not None:
+                    if (key:=tuple(row[i] for i in pk_inds)) in pk_seen:
+                        print(f"Load has failed: line {line}: Primary key duplication")
+                        raise InsertDuplicatePrimaryKeyError
+                    pk_seen.add(key)
+                for inds,ref_keys in fks:
+                    if tuple(row[i] for i in inds) not in ref_keys:
+                        print(f"Load has failed: line {line}: Referential integrity violation")
+                        raise InsertReferentialIntegrityError
+            return out
+
+        count = 0
+        batch = []
+        for line,row in enumerate(rows, 1):
+            batch.append((line, row))
+            if len(batch)==LOAD_BATCH:
+                self.store.insert_rows(tbl_name, tbl, check_batch(batch))
+                count += len(batch); batch = []
+        self.store.insert_rows(tbl_name, tbl, check_batch(batch))
+        count += len(batch)
+        print(f"{count} row(s) are loaded")
+        return count
+
+    def copy_query(self, items):
+        self.load_file(items[1], items[3][1:-1], items[5] if len(items)==6 else None)
+        return items
+
+    def comp_operand(self, items):
+        if len(items)==1:
+            return items[0]
+        return items
+
+    def literal(self, token, want=None):
+        if token.type=='PARAM':
+            # a bound python value takes the type of what it is compared with
+            value = self.param(token)
+            if value is None:
+                return [want, None]
+            if isinstance(value, bool) or not isinstance(value, (int, str)):
+                return [type(value).__name__, value]
+            if isinstance(value, int):
+                return ['int', value]
+            if want=='date' and DATE_RE.fullmatch(value):
+                return ['date', value]
+            return ['char', value]
+        val = [token.type.lower(), token.value]
+        if val[0]=='int': val[1]=int(val[1])
+        elif val[0]=='str':
+            # a quoted date compared with a date column is a date
+            val = ['date' if want=='date' and DATE_RE.fullmatch(val[1][1:-1]) else 'char', val[1][1:-1]]
+        return val
+
+    def resolve(self, tbl_col):
+        if isinstance(tbl_col, lark.Tree):
+            print("Where clause cannot contain aggregate functions")
+            raise WhereAggregateError
+        tbl,col = tbl_col if isinstance(tbl_col, list) else (None,tbl_col)
+        if (tbl is not None) and (tbl not in self.queried_tbls):
+            print("Where clause try to reference tables which are not specified")
+            raise WhereTableNotSpecified
+        
+        if tbl is not None:
+            if (tbl,col) not in self.tbl_cols:
+                print("Where clause try to reference non existing column")
+                raise WhereColumnNotExist
+        else:
+            col_cnt = 0
+            for tbl_name,col_name in self.tbl_cols:
+                if col_name==col:
+                    col_cnt+=1; tbl=tbl_name 
+            if col_cnt>1:
+                print("Where clause contains ambiguous reference")
+                raise WhereAmbiguousReference
+            if col_cnt==0:
+                print("Where clause try to reference non existing column")
+                raise WhereColumnNotExist
+        return tbl,col
+
+    def operand(self, operand, want=None):
+        # a literal becomes its value, a column its offset in the from clause layout
+        if type(operand)==lark.lexer.Token:
+            c_type,val = self.literal(operand, want)
+            return c_type, None, val
+        if self.aggs is not None:
+            # having reads group columns and aggregates from the rows of the aggregate
+            if isinstance(operand, lark.Tree):
+                c_type,i = self.aggregate_operand(operand)
+                return c_type, i, None
+            tbl_col = self.resolve(operand)
+            return self.tbl_cols[tbl_col][0], self.group_column_ref(tbl_col), None
+        tbl_col = self.resolve(operand)
+        return self.tbl_cols[tbl_col][0], self.tbl_offs[tbl_col], None
+
+    def compile_cond(self, cond):
+        # returns a function of a row giving True, False or None (unknown)
+        if cond.data=='boolean_expr':
+            terms = [self.compile_cond(boolean_term) for boolean_term in cond.children[::2]]
+            if len(terms)==1:
+                return terms[0]
+            def boolean_expr(record):
+                result = False
+                for term in terms:
+                    if (val:=term(record)) is True:
+                        return True
+                    if val is None:
+                        result = None
+                return result
+            return boolean_expr
+
+        elif cond.data=='boolean_term':
+            factors = [self.compile_cond(boolean_factor) for boolean_factor in cond.children[::2]]
+            if len(factors)==1:
+                return factors[0]
+            def boolean_term(record):
+                result = True
+                for factor in factors:
+                    if (val:=factor(record)) is False:
+                        return False
+                    if val is None:
+                        result = None
+                return result
+            return boolean_term
+
+        elif cond.data=='boolean_factor':
+            test = self.compile_cond(cond.children[-1].children[0])
+            if len(cond.children)==1:
+                return test
+            return lambda record: None if (val:=test(record)) is None else not val
+
+        elif cond.data=='parenthesized_boolean_expr':
+            return self.compile_cond(cond.children[1])
+
+        elif cond.data=='predicate':
+            return self.compile_cond(cond.children[0])
+
+        elif cond.data=='comparison_predicate':
+            _,(li,lv),(ri,rv) = self.comparison_operands(cond)
+            if (li is None and lv is None) or (ri is None and rv is None):
+                return lambda record: None
+            op = COMP_OPS[cond.children[1].value]
+            if li is None and ri is None:
+                result = op(lv, rv)
+                return lambda record: result
+            if ri is None:
+                return lambda record: None if (lo:=record[li]) is None else op(lo, rv)
+            if li is None:
+                return lambda record: None if (ro:=record[ri]) is None else op(lv, ro)
+            return lambda record: None if (lo:=record[li]) is None or (ro:=record[ri]) is None else op(lo, ro)
+
+        elif cond.data=='null_predicate':
+            tbl_col = cond.children[:-1]
+            _,i,_ = self.operand(tbl_col if len(tbl_col)==2 else tbl_col[0])
+            if len(cond.children[-1].children)==3:
+                return lambda record: record[i] is not None
+            return lambda record: record[i] is None
+
+    def comparison_operands(self, cond):
+        lo,ro = cond.children[0],cond.children[2]
+        r_type,ri,rv = self.operand(ro)
+        l_type,li,lv = self.operand(lo, r_type)
+        if type(ro)==lark.lexer.Token:
+            r_type,ri,rv = self.operand(ro, l_type)
+        if l_type!=r_type:
+            print("Where clause try to compare incomparable values")
+            raise WhereIncomparableError
+        return l_type, (li,lv), (ri,rv)
+
+    def compile_mask(self, cond):
+        # compile_cond for the columnar scan: returns a function of a batch of
+        # columns giving the masks of the rows where cond is true and where false
+        if cond.data=='boolean_expr':
+            terms = [self.compile_mask(boolean_term) for boolean_term in cond.children[::2]]
+            if len(terms)==1:
+                return terms[0]
+            return lambda cols: mask_or([term(cols) for term in terms])
+
+        elif cond.data=='boolean_term':
+            factors = [self.compile_mask(boolean_factor) for boolean_factor in cond.children[::2]]
+            if len(factors)==1:
+                return factors[0]
+            return lambda cols: mask_and([factor(cols) for factor in factors])
+
+        elif cond.data=='boolean_factor':
+            test = self.compile_mask(cond.children[-1].children[0])
+            if len(cond.children)==1:
+                return test
+            return lambda cols: test(cols)[::-1]
+
+        elif cond.data=='parenthesized_boolean_expr':
+            return self.compile_mask(cond.children[1])
+
+        elif cond.data=='predicate':
+            return self.compile_mask(cond.children[0])
+
+        elif cond.data=='comparison_predicate':
+            c_type,(li,lv),(ri,rv) = self.comparison_operands(cond)
+            if (li is None and lv is None) or (ri is None and rv is None):
+                return lambda cols: cols.const(None)
+            op = COMP_OPS[cond.children[1].value]
+            if li is None and ri is None:
+                result = op(lv, rv)
+                return lambda cols: cols.const(result)
+            lv, rv = scalar(c_type, lv), scalar(c_type, rv)
+            if ri is None:
+                return lambda cols: compare(op, cols.column(li), (rv, None))
+            if li is None:
+                return lambda cols: compare(op, (lv, None), cols.column(ri))
+            return lambda cols: compare(op, cols.column(li), cols.column(ri))
+
+        elif cond.data=='null_predicate':
+            tbl_col = cond.children[:-1]
+            _,i,_ = self.operand(tbl_col if len(tbl_col)==2 else tbl_col[0])
+            if len(cond.children[-1].children)==3:
+                return lambda cols: (~(nulls:=cols.column(i)[1]), nulls)
+            return lambda cols: ((nulls:=cols.column(i)[1]), ~nulls)
+
+    def sargs(self, tbl_name, tbl, cond, found):
+        # `col op literal` and `col is null` predicates on this table that every
+        # matching row has to satisfy, looking through ands and parentheses
+        if cond.data=='boolean_factor':
+            if len(cond.children)==1:
+                self.sargs(tbl_name, tbl, cond.children[0].children[0], found)
+        elif cond.data=='boolean_expr':
+            if len(cond.children)==1:
+                self.sargs(tbl_name, tbl, cond.children[0], found)
+        elif cond.data=='boolean_term':
+            for boolean_factor in cond.children[::2]:
+                if len(boolean_factor.children)==1:
+                    self.sargs(tbl_name, tbl, boolean_factor.children[0].children[0], found)
+        elif cond.data=='parenthesized_boolean_expr':
+            self.sargs(tbl_name, tbl, cond.children[1], found)
+        elif cond.data=='predicate':
+            self.sargs(tbl_name, tbl, cond.children[0], found)
+        elif cond.data=='comparison_predicate' and cond.children[1].value!='!=':
+            lo,op,ro = cond.children
+            op = op.value
+            if type(lo)==lark.lexer.Token:
+                lo,ro,op = ro,lo,FLIPPED_OPS[op]
+            if type(lo)==lark.lexer.Token or type(ro)!=lark.lexer.Token:
+                return
+            if (col_name:=self.own_column(tbl_name, tbl, lo)) is None:
+                return
+            c_type = tbl['cols'][col_name][0]
+            if (val:=self.literal(ro, c_type))[0]!=c_type or (value:=val[1]) is None:
+                return
+            if c_type=='int' and not (INT_MIN<=value<=INT_MAX):
+                # no stored int is out of range: a bound past it is no bound, and
+                # anything else matches nothing, which the filter finds without a key
+                if (op in ('<', '<=')) != (value>INT_MAX):
+                    return
+                op, value = ('<=', INT_MAX) if value>INT_MAX else ('>=', INT_MIN)
+            found.setdefault(col_name, []).append((op, value))
+        elif cond.data=='null_predicate' and len(cond.children[-1].children)==2:
+            tbl_col = cond.children[:-1]
+            if (col_name:=self.own_column(tbl_name, tbl, tbl_col if len(tbl_col)==2 else tbl_col[0])) is not None:
+                found.setdefault(col_name, []).append(('=', None))
+
+    def own_column(self, tbl_name, tbl, tbl_col):
+        if isinstance(tbl_col, list):
+            if tbl_col[0]!=tbl_name:
+                return None
+            tbl_col = tbl_col[1]
+        return tbl_col if tbl_col in tbl['cols'] else None
+
+    def index_scan(self, tbl_name, tbl, conds):
+        # the index narrowing the scan down the most: the longest run of leading
+        # columns fixed by `=` or `is null`, then a range on the column after them
+        found = {}
+        for cond in conds:
+            self.sargs(tbl_name, tbl, cond, found)
+        best, best_score = None, (False, 0, False)
+        for idx_name,idx in tbl['indexes'].items():
+            values = []
+            for col_name in idx['cols']:
+                if len(eq:=[val for op,val in found.get(col_name, ()) if op=='='])==0:
+                    break
+                values.append(eq[0])
+            full = len(values)==len(idx['cols'])
+            lo = hi = None
+            if not full:
+                for op,val in found.get(idx['cols'][len(values)], ()):
+                    if op in ('>', '>=') and (lo is None or val>lo[0] or (val==lo[0] and op=='>')):
+                        lo = (val, op=='>=')
+                    elif op in ('<', '<=') and (hi is None or val<hi[0] or (val==hi[0] and op=='<')):
+                        hi = (val, op=='<=')
+            score = (full and idx['unique'], len(values), lo is not None or hi is not None)
+            if score>best_score:
+                best, best_score = (idx_name, values, lo, hi), score
+        if best is None:
+            return None
+        idx_name, values, lo, hi = best
+        if lo is None and hi is None:
+            return idx_name, list(self.store.index_lookup(tbl_name, tbl, idx_name, values)), len(values)
+        if (tbl_stats:=tbl.get('stats')) is not None:
+            # a range over much of the table is better read in order than through the index
+            idx_cols = tbl['indexes'][idx_name]['cols']
+            ops = ([] if lo is None else [('>=' if lo[1] else '>', lo[0])]) + ([] if hi is None else [('<=' if hi[1] else '<', hi[0])])
+            fraction = stats.fraction(tbl_stats['cols'][idx_cols[len(values)]], ops)
+            for col_name,value in zip(idx_cols, values):
+                fraction *= stats.fraction(tbl_stats['cols'][col_name], [('=', value)])
+            if fraction>stats.SEQ_FRACTION:
+                return None
+        return idx_name, self.store.index_range(tbl_name, idx_name, values, lo, hi), len(values)
+
+    def inv_ref(self, tbl_name, tbl, records):
+        # rids of the records still referenced from another table. each
+        # referencing foreign key index is checked once for the whole statement:
+        # a few records are looked up, more than that are hashed by their encoded
+        # key and the index is walked once against the set
+        referenced = set()
+        offs = self.store.offsets(tbl_name)
+        pk_inds = [offs[col_name] for col_name in tbl['pks']]
+        ref_tbl_names = {ref_tbl_name for ref_info in tbl['invrefs'].values() for ref_tbl_name,_ in ref_info}
+        for ref_tbl_name in ref_tbl_names:
+            ref_tbl = self.store.get_table(ref_tbl_name)
+            for idx_name,idx in ref_tbl['indexes'].items():
+                if idx.get('ref')!=tbl_name:
+                    continue
+                pending = [(rid,record) for rid,record in records if rid not in referenced]
+                if len(pending)*PROBE_RATIO<self.store.row_count(ref_tbl_name):
+                    for rid,record in pending:
+                        pk_values = [record[i] for i in pk_inds]
+                        if next(self.store.index_lookup(ref_tbl_name, ref_tbl, idx_name, pk_values), None) is not None:
+                            referenced.add(rid)
+                elif len(pending)!=0:
+                    keys = {encode_key([record[i] for i in pk_inds]):rid for rid,record in pending}
+                    for key in self.store.index_keys(ref_tbl_name, ref_tbl, idx_name):
+                        if (rid:=keys.get(key)) is not None:
+                            referenced.add(rid)
+        return referenced
+
+    def matching_rows(self, tbl_name, tbl, where_clause):
+        # (rid, record) of the rows a delete or update applies to
+        if where_clause is None:
+            return list(self.store.scan(tbl_name))
+        self.queried_tbls = [tbl_name]
+        self.tbl_cols = {(tbl_name,col_name):col_info for col_name,col_info in tbl['cols'].items()}
+        self.tbl_offs = {(tbl_name,col_name):i for col_name,i in self.store.offsets(tbl_name).items()}
+
+        cond = where_clause.children[1]
+        pred = self.compile_cond(cond)
+        if (scan:=self.index_scan(tbl_name, tbl, [cond])) is not None:
+            records = ((rid, self.store.get_row(tbl_name, rid)) for rid in scan[1])
+        elif (scan:=self.parallel_scan(tbl_name, 0, len(self.tbl_offs), [cond], pred)) is not None:
+            return list(scan.records())
+        else:
+            records = self.store.scan(tbl_name)
+        return [(rid,record) for rid,record in records if pred(record) is True]
+
+    def delete_query(self, items):
+        self.mark_phase('parse')
+        tbl_name = items[2]
+
+        if (tbl:=self.store.get_table(tbl_name)) is None:
+            print('No such table')
+            raise NoSuchTable
+
+        # every row goes and nothing can refer to one of them
+        ref_tbl_names = {ref_tbl_name for ref_info in tbl['invrefs'].values() for ref_tbl_name,_ in ref_info}
+        if len(items)==3 and all(self.store.row_count(ref_tbl_name)==0 for ref_tbl_name in ref_tbl_names):
+            count = self.store.truncate(tbl_name, tbl)
+            print(f"{count} row(s) are deleted")
+        
+        else:
+            # find the rows first, then check them against the referencing
+            # tables as a set, then delete what may go
+            matched = self.matching_rows(tbl_name, tbl, items[3] if len(items)==4 else None)
+            referenced = self.inv_ref(tbl_name, tbl, matched) if ref_tbl_names else set()
+            deleted = [(rid,record) for rid,record in matched if rid not in referenced]
+            self.store.delete_rows(tbl_name, tbl, deleted)
+            inv_refs = len(referenced)
+            print(f"{len(deleted)} row(s) are deleted")
+            if inv_refs!=0:
+                print(f"{inv_refs} row(s) are not deleted due to referential integrity")
+                # the rows that could go stay deleted
+                self.store.end_statement(True)
+                raise DeleteReferentialIntegrityPassed
+
+        return items
+
+    def set_clause(self, items):
+        # shares COMP_OP with comparisons, a bare "=" would shadow it in the lexer
+        if items[1]!='=':
+            print(f"Update has failed: '{items[0]}' must be set with '='")
+            raise UpdateSetError
+        return items[0], items[2]
+
+    def update_query(self, items):
+        self.mark_phase('parse')
+        tbl_name = items[1]
+
+        if (tbl:=self.store.get_table(tbl_name)) is None:
+            print('No such table')
+            raise NoSuchTable
+
+        offs = self.store.offsets(tbl_name)
+        where_clause = items.pop() if isinstance(items[-1], lark.Tree) else None
+        changes = {}
+        for col_name,value in items[3:]:
+            if col_name not in offs:
+                print(f"Update has failed: '{col_name}' does not exist")
+                raise UpdateColumnExistenceError
+            changes[offs[col_name]] = self.token_value(value, col_name, tbl['cols'][col_name], "Update has failed", UPDATE_ERRORS)
+        cols = {col_name for col_name,i in offs.items() if i in changes}
+
+        matched = self.matching_rows(tbl_name, tbl, where_clause)
+        updates = []
+        for rid,record in matched:
+            new = list(record)
+            for i,value in changes.items():
+                new[i] = value
+            if new!=record:
+                updates.append((rid, record, new))
+
+        # keys are checked only when the statement sets one of their columns,
+        # and only for the rows whose key actually changes
+        if 'pk' in tbl['indexes'] and not cols.isdisjoint(tbl['pks']):
+            pk_inds = [offs[col_name] for col_name in tbl['pks']]
+            rids = {rid for rid,_,_ in updates}
+            seen = set()
+            moved = []
+            for rid,old,new in updates:
+                pk_values = [new[i] for i in pk_inds]
+                if tuple(pk_values) in seen:
+                    print("Update has failed: Primary key duplication")
+                    raise UpdateDuplicatePrimaryKeyError
+                seen.add(tuple(pk_values))
+                if pk_values!=[old[i] for i in pk_inds]:
+                    if (other:=next(self.store.index_lookup(tbl_name, tbl, 'pk', pk_values), None)) is not None and other not in rids:
+                        print("Update has failed: Primary key duplication")
+                        raise UpdateDuplicatePrimaryKeyError
+                    moved.append((rid, old))
+            if len(tbl['invrefs'])!=0 and len(self.inv_ref(tbl_name, tbl, moved))!=0:
+                print("Update has failed: Referential integrity violation")
+                raise UpdateReferentialIntegrityError
+
+        for idx in tbl['indexes'].values():
+            if (ref_tbl_name:=idx.get('ref')) is None or cols.isdisjoint(idx['cols']):
+                continue
+            ref_tbl = self.store.get_table(ref_tbl_name)
+            fk_inds = [offs[col_name] for col_name in idx['cols']]
+            present = set()
+            for rid,old,new in updates:
+                fk_values = [new[i] for i in fk_inds]
+                if tuple(fk_values) in present or fk_values==[old[i] for i in fk_inds]:
+                    continue
+                if None in fk_values or next(self.store.index_lookup(ref_tbl_name, ref_tbl, 'pk', fk_values), None) is None:
+                    print("Update has failed: Referential integrity violation")
+                    raise UpdateReferentialIntegrityError
+                present.add(tuple(fk_values))
+
+        self.store.update_rows(tbl_name, tbl, updates, cols)
+        print(f"{len(updates)} row(s) are updated")
+        return items
+
+    def select_list(self, items):
+        return items
+
+    def table_expression(self, items):
+        if len(items)==2:
+            items[1] = items[1].children[1]
+        return items
+
+    def limit_clause(self, items):
+        limit = max(int(items[1]), 0)
+        offset = max(int(items[3]), 0) if len(items)==4 else 0
+        return limit, offset
+
+    def from_clause(self, items):
+        return items[1]
+
+    def table_reference_list(self, items):
+        return items
+
+    def referred_table(self, items):
+        return items[0]
+
+    def selected_column(self, items):
+        return items
+
+    def conjuncts(self, cond, conds):
+        # split the where clause on its top level ands, looking into parentheses
+        if cond.data=='boolean_expr' and len(cond.children)==1:
+            for boolean_factor in cond.children[0].children[::2]:
+                test = boolean_factor.children[-1].children[0]
+                if len(boolean_factor.children)==1 and test.data=='parenthesized_boolean_expr':
+                    self.conjuncts(test.children[1], conds)
+                else:
+                    conds.append(boolean_factor)
+        else:
+            conds.append(cond)
+        return conds
+
+    def cond_tables(self, cond, tbls):
+        if cond.data=='comparison_predicate':
+            for operand in cond.children[::2]:
+                if type(operand)!=lark.lexer.Token:
+                    tbls.add(self.resolve(operand)[0])
+        elif cond.data=='null_predicate':
+            tbl_col = cond.children[:-1]
+            tbls.add(self.resolve(tbl_col if len(tbl_col)==2 else tbl_col[0])[0])
+        else:
+            for child in cond.children:
+                if isinstance(child, lark.Tree):
+                    self.cond_tables(child, tbls)
+        return tbls
+
+    def cond_text(self, cond):
+        if isinstance(cond, list):
+            return '.'.join(cond)
+        if not isinstance(cond, lark.Tree):
+            return str(cond)
+        if cond.data=='parenthesized_boolean_expr':
+            return '(' + self.cond_text(cond.children[1]) + ')'
+        if cond.data=='aggregate':
+            return self.agg_text(cond)
+        if cond.data=='null_predicate' and len(cond.children)==3:
+            return '.'.join(cond.children[:2]) + ' ' + self.cond_text(cond.children[2])
+        return ' '.join(map(self.cond_text, cond.children))
+
+    def join_edge(self, cond):
+        # `t1.c1 = t2.c2` between comparable columns of two different tables
+        if len(cond.children)!=1 or cond.children[0].children[0].data!='predicate':
+            return None
+        pred = cond.children[0].children[0].children[0]
+        if pred.data!='comparison_predicate' or pred.children[1].value!='=':
+            return None
+        lo,_,ro = pred.children
+        if type(lo)==lark.lexer.Token or type(ro)==lark.lexer.Token:
+            return None
+        lo,ro = self.resolve(lo),self.resolve(ro)
+        if lo[0]==ro[0] or self.tbl_cols[lo][0]!=self.tbl_cols[ro][0]:
+            return None
+        return lo,ro
+
+    def make_pred(self, conds):
+        preds = [self.compile_cond(cond) for cond in conds]
+        if len(preds)==1:
+            pred = preds[0]
+            return lambda row: pred(row) is True
+        return lambda row: all(pred(row) is True for pred in preds)
+
+    def make_mask(self, conds):
+        masks = [self.compile_mask(cond) for cond in conds]
+        if len(masks)==1:
+            return masks[0]
+        return lambda cols: mask_and([mask(cols) for mask in masks])
+
+    def parallel_scan(self, tbl_name, off, width, conds, pred):
+        if self.parallel<2 or self.store.row_count(tbl_name)<PARALLEL_MIN_ROWS:
+            return None
+        spec = (self.store.get_table(tbl_name)['cols'], off, width, conds, self.queried_tbls, self.tbl_cols, self.tbl_offs, self.params, self.columnar)
+        return ParallelScan(self.store, tbl_name, off, width, pred, spec, self.parallel, ' and '.join(map(self.cond_text, conds)))
+
+    def plan_scan(self, tbl_name, tbl, off, width, conds):
+        idx_name, rids, neq = (self.index_scan(tbl_name, tbl, conds) if len(conds)!=0 else None) or (None, None, 0)
+        pred = self.make_pred(conds) if len(conds)!=0 else None
+        scan = None
+        if pred is not None and rids is None:
+            if (scan:=self.parallel_scan(tbl_name, off, width, conds, pred)) is None and self.columnar:
+                scan = ColumnarScan(self.store, tbl_name, off, width, pred, self.make_mask(conds), ' and '.join(map(self.cond_text, conds)))
+        if scan is None:
+            order = None if idx_name is None else (tbl['indexes'][idx_name]['cols'][:neq], tbl['indexes'][idx_name]['cols'][neq:])
+            scan = Scan(self.store, tbl_name, off, width, pred, rids, ' and '.join(map(self.cond_text, conds)), idx_name, order)
+        if scan.est is None:
+            scan.est = self.estimate(tbl_name, tbl, conds)
+        return scan
+
+    def estimate(self, tbl_name, tbl, conds):
+        # rows of a scan filtered by conds, from the statistics of its table if it
+        # has been analyzed: the columns are taken as independent of each other
+        if (tbl_stats:=tbl.get('stats')) is None:
+            return None
+        est = self.store.row_count(tbl_name)
+        found = {}
+        for cond in conds:
+            before = sum(map(len, found.values()))
+            self.sargs(tbl_name, tbl, cond, found)
+            if sum(map(len, found.values()))==before:
+                est *= stats.DEFAULT_FRACTION
+        for col_name,ops in found.items():
+            est *= stats.fraction(tbl_stats['cols'][col_name], ops)
+        return round(est)
+
+    def join_estimate(self, plan, scan, tbl, keys):
+        # every outer row matching the inner rows of one distinct key value
+        if plan.est is None or scan.est is None or (tbl_stats:=tbl.get('stats')) is None:
+            return None
+        distinct = max(tbl_stats['cols'][col_name]['distinct'] for _,_,col_name in keys)
+        return round(plan.est*scan.est/max(distinct, 1))
+
+    def index_order(self, scan, tbl_name, tbl, keys):
+        # a scan of one table giving its rows in the order of the sort keys, if
+        # there is one: the index scan already planned when the keys follow the
+        # columns it leaves unfixed, or else a walk of an index starting with them
+        col_names = list(tbl['cols'])
+        keys = [(col_names[i-scan.off], desc, nulls_first) for i,desc,nulls_first in keys]
+        if scan.order is not None:
+            fixed, ordered = scan.order
+            keys = [key for key in keys if key[0] not in fixed]
+            if all(not desc and nulls_first for _,desc,nulls_first in keys) and [col_name for col_name,_,_ in keys]==ordered[:len(keys)]:
+                return scan
+            return None
+        if scan.rids is not None:
+            return None
+        if all(not desc and nulls_first for _,desc,nulls_first in keys):
+            backward = False
+        elif all(desc and not nulls_first for _,desc,nulls_first in keys):
+            backward = True
+        else:
+            return None
+        sort_cols = [col_name for col_name,_,_ in keys]
+        for idx_name,idx in tbl['indexes'].items():
+            if idx['cols'][:len(sort_cols)]==sort_cols:
+                rids = self.store.index_walk(tbl_name, idx_name, backward)
+                walk = Scan(self.store, tbl_name, scan.off, scan.width, scan.pred, rids, scan.filter_text, idx_name)
+                if backward:
+                    walk.label = walk.label.replace('Index Scan', 'Index Scan Backward', 1)
+                return walk
+        return None
+
+    def plan_joins(self, tbl_names, tbls, conds):
+        offs = {}
+        width = 0
+        for tbl_name in tbl_names:
+            offs[tbl_name] = width
+            width += len(tbls[tbl_name]['cols'])
+
+        local = {tbl_name:[] for tbl_name in tbl_names}
+        edges = []
+        others = []
+        for cond in conds:
+            refs = self.cond_tables(cond, set())
+            if len(refs)==1:
+                local[refs.pop()].append(cond)
+            elif (edge:=self.join_edge(cond)) is not None:
+                edges.append((edge, cond))
+            else:
+                others.append((refs, cond))
+        scans = {tbl_name:self.plan_scan(tbl_name, tbls[tbl_name], offs[tbl_name], width, local[tbl_name]) for tbl_name in tbl_names}
+
+        # start from the most selective scan and keep adding a table connected by
+        # an equality to what has been joined so far, falling back to a cross product
+        known = [tbl_name for tbl_name in tbl_names if scans[tbl_name].est is not None]
+        start = min(known, key=lambda tbl_name:scans[tbl_name].est) if known else tbl_names[0]
+        plan = scans[start]
+        joined = {start}
+        while True:
+            plan = self.attach_filters(plan, others, joined)
+            if len(joined)==len(tbl_names):
+                break
+            connected = [tbl_name for tbl_name in tbl_names if tbl_name not in joined and
+                         any({lo[0],ro[0]}-joined=={tbl_name} for (lo,ro),_ in edges)]
+            if len(connected)==0:
+                nxt = next(tbl_name for tbl_name in tbl_names if tbl_name not in joined)
+                plan = CrossJoin(plan, scans[nxt])
+                joined.add(nxt)
+                continue
+
+            nxt = min(connected, key=lambda tbl_name:(scans[tbl_name].est is None, scans[tbl_name].est or 0))
+            keys = []
+            texts = []
+            for (lo,ro),cond in edges:
+                if {lo[0],ro[0]}-joined=={nxt}:
+                    if lo[0]==nxt:
+                        lo,ro = ro,lo
+                    keys.append((self.tbl_offs[lo], self.tbl_offs[ro], ro[1]))
+                    texts.append(self.cond_text(cond))
+            plan = self.plan_join(plan, nxt, tbls[nxt], scans[nxt], keys, ' and '.join(texts))
+            joined.add(nxt)
+        return plan
+
+    def plan_join(self, plan, tbl_name, tbl, scan, keys, cond_text):
+        # an index nested loop only pays off when the outer side is known to be
+        # small next to the inner table, or a single row; otherwise scan the
+        # inner table once and hash it, or hash the outer side if it is smaller
+        join = None
+        if plan.est is not None and (plan.est<=1 or plan.est*PROBE_RATIO<self.store.row_count(tbl_name)):
+            key_cols = {col_name for _,_,col_name in keys}
+            best, prefix = None, []
+            for idx_name,idx in tbl['indexes'].items():
+                cols = []
+                for col_name in idx['cols']:
+                    if col_name not in key_cols:
+                        break
+                    cols.append(col_name)
+                if len(cols)>len(prefix):
+                    best, prefix = idx_name, cols
+            if best is not None:
+                probe = [next(l for l,_,col_name in keys if col_name==idx_col) for idx_col in prefix]
+                join = IndexJoin(self.store, plan, tbl_name, tbl, best, probe, [(l,r) for l,r,_ in keys], scan, cond_text)
+        if join is None and 'stats' in tbl and plan.est is not None and scan.est is not None and scan.est>plan.est:
+            join = HashJoin(scan, plan, [(r,l) for l,r,_ in keys], cond_text)
+        elif join is None:
+            join = HashJoin(plan, scan, [(l,r) for l,r,_ in keys], cond_text)
+        if join.est is None:
+            join.est = self.join_estimate(plan, scan, tbl, keys)
+        return join
+
+    def attach_filters(self, plan, others, joined):
+        ready = [cond for refs,cond in others if refs<=joined]
+        if len(ready)==0:
+            return plan
+        others[:] = [(refs,cond) for refs,cond in others if not refs<=joined]
+        return Filter(plan, self.make_pred(ready), ' and '.join(map(self.cond_text, ready)))
+
+    def plan_select(self, items):
+        tbl_names = items[2][0]
+        sel_tbl_cols = {}
+        tbls = {}
+        for tbl_name in tbl_names:
+            if (tbl:=self.store.get_table(tbl_name)) is None:
+                print(f"Selection has failed: '{tbl_name}' does not exist")
+                raise SelectTableExistenceError
+            tbls[tbl_name] = tbl
+            for col_name,col_info in tbl['cols'].items():
+                sel_tbl_cols[(tbl_name,col_name)] = col_info
+
+        self.queried_tbls = tbl_names
+        self.tbl_cols = sel_tbl_cols
+        self.tbl_offs = {tbl_col:i for i,tbl_col in enumerate(sel_tbl_cols)}
+        conds = self.conjuncts(items[2][1], []) if len(items[2])!=1 else []
+        plan = self.plan_joins(tbl_names, tbls, conds)
+
+        select_list = items[1]
+        clauses = {clause.data:clause for clause in items[3:] if isinstance(clause, lark.Tree)}
+        limit = items[-1] if isinstance(items[-1], tuple) else None
+        order_by = clauses.pop('order_by_clause', None)
+        sort_aggs = order_by is not None and any(isinstance(sort_key.children[0], lark.Tree) for sort_key in order_by.children[2:])
+        if len(clauses)!=0 or sort_aggs or any(isinstance(sel_tbl_col[0], lark.Tree) for sel_tbl_col in select_list):
+            plan, sel_order, sel_tbl_cols = self.plan_aggregate(plan, tbl_names, conds, select_list, clauses, order_by, limit)
+        else:
+            if len(select_list)!=0:
+                sel_order = []
+                sel_tbl_cols = []
+                for sel_tbl_col in select_list:
+                    sel_tbl_col, sel_as = self.split_alias(sel_tbl_col)
+                    tbl_col = self.select_column(sel_tbl_col)
+                    sel_order.append(self.tbl_offs[tbl_col])
+                    sel_tbl_cols.append(tbl_col if sel_as is None else [tbl_col[0],sel_as])
+            else:
+                sel_order = None
+                sel_tbl_cols = list(sel_tbl_cols)
+            if order_by is not None:
+                keys = self.sort_keys(order_by, select_list, sel_order, lambda tbl_col: self.tbl_offs[tbl_col])
+                ordered = None
+                if len(tbl_names)==1 and isinstance(plan, Scan):
+                    ordered = self.index_order(plan, tbl_names[0], tbls[tbl_names[0]], keys)
+                plan = ordered or self.plan_sort(plan, keys, order_by, limit)
+
+        plan = Project(plan, sel_order, ['.'.join(filter(None, tbl_col)) for tbl_col in sel_tbl_cols])
+        if limit is not None:
+            plan = Limit(plan, *limit)
+        return plan, sel_tbl_cols
+
+    def split_alias(self, sel_tbl_col):
+        if len(sel_tbl_col)>=3 and type(sel_tbl_col[-2])==lark.lexer.Token:
+            return sel_tbl_col[:-2], sel_tbl_col[-1]
+        return sel_tbl_col, None
+
+    def select_column(self, sel_tbl_col):
+        # the (table, column) named by `col` or `tbl.col` outside the where clause
+        if len(sel_tbl_col)==2:
+            sel_tbl,sel_col = sel_tbl_col
+            if (sel_tbl not in self.queried_tbls) or ((sel_tbl,sel_col) not in self.tbl_cols):
+                print(f"Selection has failed: fail to resolve '{sel_tbl+'.'+sel_col}'")
+                raise SelectColumnResolveError
+            return sel_tbl, sel_col
+        sel_col = sel_tbl_col[0]
+        sel_tbls = [tbl_name for tbl_name,col_name in self.tbl_cols if col_name==sel_col]
+        if len(sel_tbls)!=1:
+            print(f"Selection has failed: fail to resolve '{sel_col}'")
+            raise SelectColumnResolveError
+        return sel_tbls[0], sel_col
+
+    def agg_text(self, agg):
+        return f"{agg.children[0].lower()}({'.'.join(agg.children[2:-1]) or '*'})"
+
+    def aggregate_operand(self, agg):
+        # the type of an aggregate and its offset in the rows of the aggregate;
+        # an aggregate named more than once is computed once
+        func = agg.children[0].lower()
+        if len(agg.children)==3:
+            func, tbl_col, c_type = 'count(*)', None, 'int'
+        else:
+            tbl_col = self.select_column(agg.children[2:-1])
+            c_type = self.tbl_cols[tbl_col][0]
+            if func in ('sum', 'avg') and c_type!='int':
+                print(f"Selection has failed: {self.agg_text(agg)} needs an int column")
+                raise SelectAggregateTypeError
+            if func in ('count', 'sum', 'avg'):
+                c_type = 'int'
+        if (func,tbl_col) not in self.aggs:
+            self.aggs.append((func,tbl_col))
+        return c_type, len(self.group_offs)+self.aggs.index((func,tbl_col))
+
+    def group_column_ref(self, tbl_col):
+        if tbl_col not in self.group_offs:
+            print(f"Selection has failed: '{'.'.join(tbl_col)}' must appear in the group by clause or be used in an aggregate function")
+            raise SelectGroupByError
+        return self.group_offs[tbl_col]
+
+    def sort_keys(self, clause, select_list, sel_order, column_off):
+        # (offset, descending, nulls first) of every sort key; nulls sort before
+        # every other value unless said otherwise, as they do in the indexes. a
+        # name given to a selected column with AS refers to that column
+        aliases = {}
+        for i,sel_tbl_col in enumerate(select_list):
+            if (sel_as:=self.split_alias(sel_tbl_col)[1]) is not None:
+                aliases.setdefault(sel_as, sel_order[i])
+        keys = []
+        for sort_key in clause.children[2:]:
+            ref = [child for child in sort_key.children if type(child)!=lark.lexer.Token]
+            flags = [child.type for child in sort_key.children if type(child)==lark.lexer.Token]
+            desc = 'DESC' in flags
+            nulls_first = 'FIRST' in flags if 'NULLS' in flags else not desc
+            if isinstance(ref[0], lark.Tree):
+                off = self.aggregate_operand(ref[0])[1]
+            elif len(ref)==1 and ref[0] in aliases:
+                off = aliases[ref[0]]
+            else:
+                off = column_off(self.select_column(ref))
+            keys.append((off, desc, nulls_first))
+        return keys
+
+    def plan_sort(self, plan, keys, clause, limit):
+        texts = []
+        for sort_key in clause.children[2:]:
+            ref = sort_key.children[0]
+            text = self.agg_text(ref) if isinstance(ref, lark.Tree) else '.'.join(child for child in sort_key.children if type(child)!=lark.lexer.Token)
+            texts.append(' '.join([text]+[child.lower() for child in sort_key.children if type(child)==lark.lexer.Token]))
+        return Sort(plan, keys, ', '.join(texts), None if limit is None else sum(limit), self.sort_memory)
+
+    def plan_aggregate(self, plan, tbl_names, conds, select_list, clauses, order_by=None, limit=None):
+        # rows of the aggregate are the group columns followed by the aggregates;
+        # the select list and the having clause are resolved against them
+        group = []
+        if (clause:=clauses.get('group_by_clause')) is not None:
+            for group_column in clause.children[2:]:
+                if (tbl_col:=self.select_column(group_column.children)) not in group:
+                    group.append(tbl_col)
+        self.group_offs = {tbl_col:i for i,tbl_col in enumerate(group)}
+        self.aggs = []
+        if len(select_list)==0:
+            print("Selection has failed: '*' cannot be used with aggregates")
+            raise SelectGroupByError
+
+        sel_order = []
+        sel_tbl_cols = []
+        for sel_tbl_col in select_list:
+            sel_tbl_col, sel_as = self.split_alias(sel_tbl_col)
+            if isinstance(sel_tbl_col[0], lark.Tree):
+                sel_order.append(self.aggregate_operand(sel_tbl_col[0])[1])
+                sel_tbl_cols.append([None, sel_as or self.agg_text(sel_tbl_col[0])])
+            else:
+                tbl_col = self.select_column(sel_tbl_col)
+                sel_order.append(self.group_column_ref(tbl_col))
+                sel_tbl_cols.append([tbl_col[0], sel_as or tbl_col[1]])
+        having = None
+        if (clause:=clauses.get('having_clause')) is not None:
+            having = self.compile_cond(clause.children[1])
+        if order_by is not None:
+            keys = self.sort_keys(order_by, select_list, sel_order, self.group_column_ref)
+
+        agg_text = ', '.join(f"{func}({'.'.join(tbl_col)})" if tbl_col is not None else func for func,tbl_col in self.aggs)
+        if len(group)!=0:
+            agg_text = f"group by {', '.join('.'.join(tbl_col) for tbl_col in group)}" + (f": {agg_text}" if agg_text else '')
+        if len(group)==0 and len(conds)==0 and len(tbl_names)==1 and self.aggs==[('count(*)', None)]:
+            # the number of rows is kept with the table
+            plan = RowCount(self.store, tbl_names[0])
+        else:
+            aggs = [(func, 0 if tbl_col is None else self.tbl_offs[tbl_col]) for func,tbl_col in self.aggs]
+            plan = HashAggregate(plan, [self.tbl_offs[tbl_col] for tbl_col in group], aggs, agg_text)
+        if having is not None:
+            plan = Filter(plan, lambda row: having(row) is True, self.cond_text(clause.children[1]))
+        if order_by is not None:
+            plan = self.plan_sort(plan, keys, order_by, limit)
+        return plan, sel_order, sel_tbl_cols
+
+    def cache_key(self, node):
+        # the statement as parsed, keywords by their type and placeholders by
+        # the values bound to them
+        if isinstance(node, lark.Tree):
+            return (node.data, *map(self.cache_key, node.children))
+        if isinstance(node, lark.lexer.Token):
+            if node.type=='PARAM':
+                value = self.param(node)
+                return (node.type, type(value).__name__, value)
+            return node.type if node.type==node.value.upper() else (node.type, node.value)
+        if isinstance(node, (list, tuple)):
+            return tuple(map(self.cache_key, node))
+        return node
+
+    def select_query(self, items):
+        self.mark_phase('parse')
+        plan, sel_tbl_cols = self.plan_select(items)
+        self.mark_phase('plan')
+        rows = plan.rows()
+        # only outside transactions: a rolled back write takes its table version
+        # back, and the next write would hand the same version out again
+        if (cache:=self.cache) is not None and self.store.txn is None:
+            key = self.cache_key(items)
+            versions = (self.store.version, *[(tbl_name, self.store.table_version(tbl_name)) for tbl_name in sorted(set(self.queried_tbls))])
+            if (cached:=cache.get(key, versions)) is not None:
+                rows = cached
+            else:
+                rows = cache.collect(key, versions, rows)
+        if self.profile is not None:
+            rows = self.profile.count(rows)
+        names = [col_name for _,col_name in sel_tbl_cols]
+        if self.output=='jsonl' and len(set(names))!=len(names):
+            # keys of a json object must differ: qualify the names that collide
+            names = ['.'.join(filter(None, tbl_col)) if names.count(tbl_col[1])>1 else tbl_col[1] for tbl_col in sel_tbl_cols]
+        render(names, rows, self.output)
+        return items
+
+    def begin_query(self, items):
+        if self.store.txn is not None:
+            print("Begin has failed: a transaction is already in progress")
+            raise TransactionStateError
+        self.store.begin()
+        print("Transaction started")
+        return items
+
+    def commit_query(self, items):
+        if self.store.txn is None:
+            print("Commit has failed: no transaction is in progress")
+            raise TransactionStateError
+        self.store.commit()
+        print("Transaction committed")
+        return items
+
+    def rollback_query(self, items):
+        if self.store.txn is None:
+            print("Rollback has failed: no transaction is in progress")
+            raise TransactionStateError
+        self.store.rollback()
+        print("Transaction rolled back")
+        return items
+
+    def explain_query(self, items):
+        if items[1].type!='ANALYZE':
+            plan, _ = self.plan_select(items[1:])
+            print('\n'.join(plan.explain()))
+            return items
+
+        # runs the query without printing its rows
+        io = self.store.rows_read, self.store.bytes_read
+        start = time.perf_counter()
+        plan, _ = self.plan_select(items[2:])
+        planned = time.perf_counter()
+        plan.instrument()
+        rows = plan.rows()
+        for _ in rows:
+            pass
+        rows.close()
+        done = time.perf_counter()
+        print('\n'.join(plan.explain()))
+        print(f"Planning time: {(planned-start)*1000:.3f} ms")
+        print(f"Execution time: {(done-planned)*1000:.3f} ms")
+        print(f"Read: {self.store.rows_read-io[0]} row(s), {self.store.bytes_read-io[1]} bytes")
+        return items
+
+GRAMMAR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'grammar.lark')
+
+def build_parser(transformer=None):
+    # the LALR tables are pickled by lark next to the other temp files, keyed by
+    # the grammar text, so only the first start after a grammar change builds them.
+    # given a transformer, every rule runs as soon as it is reduced and no parse
+    # tree is built; without one the parser returns trees (for prepared statements).
+    # lark pickles its options with the tables, so the cache is always written by
+    # a parser without the transformer (which holds the session and its locks)
+    with open(GRAMMAR) as file:
+        grammar = file.read()
+    parser = lark.Lark(grammar, start="command", parser='lalr', cache=True)
+    if transformer is None:
+        return parser
+    return lark.Lark(grammar, start="command", parser='lalr', cache=True, transformer=transformer)
+
+def split_queries(s):
+    return [x + ';' for x in s.split(';')[:-1]]
+
+class Prepared:
+    # a statement parsed once; executing it only binds the ? placeholders, and
+    # an INSERT goes straight to insert_rows without touching lark at all
+    def __init__(self, transformer, tree, sql=None):
+        self.transformer = transformer
+        self.tree = tree
+        self.sql = sql
+        self.nparams = len(list(tree.scan_values(lambda v: isinstance(v, lark.lexer.Token) and v.type=='PARAM')))
+        self.insert = None
+        query_list = tree.children[0]
+        if isinstance(query_list, lark.Tree) and len(query_list.children)!=1:
+            raise ValueError("only a single statement can be prepared")
+        if isinstance(query_list, lark.Tree) and (query:=query_list.children[0].children[0]).data=='insert_query':
+            transformer.clean()
+            tbl_name = transformer.transform(query.children[2])
+            self.insert = (tbl_name, *transformer.insert_source(transformer.transform(query.children[3])))
+
+    def bind(self, params):
+        if len(params)!=self.nparams:
+            print(f"Query has failed: {self.nparams} parameter(s) expected, {len(params)} given")
+            raise ParameterBindingError
+
+    def execute(self, *params):
+        self.bind(params)
+        transformer = self.transformer
+        transformer.clean(self.sql)
+        transformer.params = params
+        with transformer.store.statement():
+            if self.insert is not None:
+                count = transformer.insert_rows(*self.insert)
+                transformer.end_profile()
+                return count
+            try:
+                return transformer.transform(self.tree)
+            except lark.exceptions.VisitError as e:
+                raise e.orig_exc
+
+    def executemany(self, seq_of_params):
+        # all rows of a prepared INSERT are written by one statement
+        if self.insert is None:
+            return [self.execute(*params) for params in seq_of_params]
+        tbl_name, cols, template = self.insert
+        params, rows = [], []
+        for values in seq_of_params:
+            self.bind(values)
+            base = len(params)
+            params.extend(values)
+            for row in template:
+                rows.append([lark.lexer.Token('PARAM', base+value.value) if value is not None and value.type=='PARAM' else value for value in row])
+        transformer = self.transformer
+        transformer.clean(self.sql)
+        transformer.params = params
+        with transformer.store.statement():
+            count = transformer.insert_rows(tbl_name, cols, rows)
+            transformer.end_profile()
+            return count
+
+class Database:
+    def __init__(self, home='.', cache_size=0, parallel=0):
+        self.store = Storage(home)
+        self.transformer = Transformer(self.store)
+        self.transformer.parallel = parallel
+        if cache_size:
+            self.transformer.cache = ResultCache(cache_size)
+        self.parser = build_parser(self.transformer)
+        self.tree_parser = None
+
+    def close(self):
+        self.store.close()
+
+    def execute(self, sql):
+        for query in split_queries(sql):
+            self.transformer.clean(query)
+            with self.store.statement():
+                self.parser.parse(query)
+
+    def prepare(self, sql):
+        if self.tree_parser is None:
+            self.tree_parser = build_parser()
+        return Prepared(self.transformer, self.tree_parser.parse(sql), sql)
+
+    def load(self, tbl_name, path, fmt=None):
+        self.transformer.clean()
+        with self.store.statement():
+            return self.transformer.load_file(tbl_name, path, fmt)
+
+def input_queries(prompt):
+    s = input(prompt)
+    if not s.strip():
+        return []
+    if s.lstrip().startswith('\\'):
+        # a meta command is the rest of its line
+        return [s.strip()]
+    while not s.rstrip().endswith(';'):
+        s += '\n' + input()
+    return split_queries(s)
+
+def meta_command(transformer, line):
+    name, _, arg = line[1:].partition(' ')
+    arg = arg.strip().lower()
+    if name=='format':
+        if arg not in FORMATS:
+            print(f"Unknown format '{arg}', use one of {', '.join(FORMATS)}")
+            return
+        transformer.output = arg
+        print(f"Output format is {arg}")
+    elif name=='cache':
+        if transformer.cache is None:
+            print("The result cache is off")
+            return
+        print(', '.join(f'{value} {name}' for name,value in transformer.cache.stats().items()))
+    elif name=='timing':
+        if arg not in ('', 'on', 'off'):
+            print(f"Unknown timing '{arg}', use on or off")
+            return
+        transformer.timing = not transformer.timing if arg=='' else arg=='on'
+        print(f"Timing is {'on' if transformer.timing else 'off'}")
+    else:
+        print(f"Unknown command '\\{name}'")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="query the database in the current directory")
+    ap.add_argument('--format', choices=list(FORMATS), default='table', help="how select prints its rows; \\format changes it")
+    ap.add_argument('--cache-size', type=int, default=0, help="bytes of select results to keep; \\cache shows its counters")
+    ap.add_argument('--slow-log', help="append statements slower than --slow-ms to this file")
+    ap.add_argument('--slow-ms', type=float, default=SLOW_MS)
+    ap.add_argument('--parallel', type=int, default=0, help="processes to spread filtered scans of large tables over")
+    args = ap.parse_args()
+    prompt = "DB_example> "
+
+    store = Storage()
+    transformer = Transformer(store)
+    transformer.output = args.format
+    if args.cache_size:
+        transformer.cache = ResultCache(args.cache_size)
+    transformer.parallel = args.parallel
+    if args.slow_log:
+        transformer.slow_log = SlowLog(args.slow_log, args.slow_ms)
+    parser = build_parser(transformer)
+
+    while True:
+        for query in input_queries(prompt):
+            if query.startswith('\\'):
+                meta_command(transformer, query)
+                continue
+            try:
+                transformer.clean(query)
+                with store.statement():
+                    msg = parser.parse(query)[0]
+            except Exception as e:
+                if isinstance(e, lark.exceptions.UnexpectedInput):
+                    print(prompt + "Syntax error")
                 break
\ No newline at end of file
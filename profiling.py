@@ -0,0 +1,71 @@
+import json
+import threading
+import time
+from datetime import datetime
+
+# where the time of a statement goes. parsing and executing are interleaved
+# (the transformer runs each rule as lark reduces it), so 'parse' is the time
+# until the statement's own rule starts, 'plan' the planning of a select and
+# 'execute' the rest, printing the result included. what the statement read and
+# wrote comes from the counters of its session
+SLOW_MS = 100
+
+class Profile:
+    def __init__(self, store, sql=None):
+        self.store = store
+        self.sql = sql
+        self.phases = {}
+        self.rows = None
+        self.io = self.counters()
+        self.start = self.mark = time.perf_counter()
+        self.total = None
+
+    def counters(self):
+        store = self.store
+        return store.rows_read, store.bytes_read, store.bytes_written
+
+    def phase(self, name):
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0)+(now-self.mark)*1000
+        self.mark = now
+
+    def count(self, rows):
+        self.rows = 0
+        for row in rows:
+            self.rows += 1
+            yield row
+
+    def finish(self):
+        self.phase('execute')
+        self.total = (self.mark-self.start)*1000
+        self.io = [after-before for before,after in zip(self.io, self.counters())]
+
+    def summary(self):
+        phases = ', '.join(f'{name} {ms:.3f}' for name,ms in self.phases.items())
+        rows_read, bytes_read, bytes_written = self.io
+        text = f"Time: {self.total:.3f} ms ({phases}); read {rows_read} row(s), {bytes_read} bytes; wrote {bytes_written} bytes"
+        return text if self.rows is None else text + f"; {self.rows} row(s) returned"
+
+    def record(self):
+        rows_read, bytes_read, bytes_written = self.io
+        return dict(at=datetime.now().isoformat(timespec='seconds'), ms=round(self.total, 3),
+                    phases={name:round(ms, 3) for name,ms in self.phases.items()}, rows=self.rows,
+                    rows_read=rows_read, bytes_read=bytes_read, bytes_written=bytes_written, sql=self.sql)
+
+class SlowLog:
+    # statements that took threshold ms or more, one json object per line;
+    # sessions of a server share one
+    def __init__(self, path, threshold=SLOW_MS):
+        self.file = open(path, 'a', buffering=1)
+        self.threshold = threshold
+        self.lock = threading.Lock()
+
+    def write(self, profile):
+        if profile.total<self.threshold:
+            return
+        line = json.dumps(profile.record(), ensure_ascii=False)
+        with self.lock:
+            self.file.write(line+'\n')
+
+    def close(self):
+        self.file.close()
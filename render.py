@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+import sys
+from itertools import chain, islice
+
+# results are written a batch of rows at a time, each batch as one string, so
+# a large result costs one write per batch instead of one per cell. table
+# widths come from the header and a sample of the first rows; a longer value
+# further down only pushes its own line out of alignment
+BATCH = 1000
+SAMPLE = 1000
+TSV_ESCAPES = str.maketrans({'\\':'\\\\', '\t':'\\t', '\n':'\\n', '\r':'\\r'})
+
+def batches(rows):
+    while batch:=list(islice(rows, BATCH)):
+        yield batch
+
+def render_table(names, rows, out):
+    sample = list(islice(rows, SAMPLE))
+    widths = [len(name) for name in names]
+    for row in sample:
+        for i,value in enumerate(row):
+            if (n:=len(str(value)))>widths[i]:
+                widths[i] = n
+    div = '+-' + '-+-'.join('-'*width for width in widths) + '-+\n'
+    line = ('| ' + ' | '.join(f'{{:<{width}}}' for width in widths) + ' |\n').format
+    out.write(div + line(*names) + div)
+    for batch in chain([sample], batches(rows)):
+        out.write(''.join([line(*map(str, row)) for row in batch]))
+    out.write(div)
+
+def render_csv(names, rows, out):
+    # nulls are empty fields
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(names)
+    for batch in batches(rows):
+        writer.writerows(batch)
+        out.write(buf.getvalue())
+        buf.seek(0); buf.truncate()
+    out.write(buf.getvalue())
+
+def render_tsv(names, rows, out):
+    # the text format of postgres' COPY: nulls are \N, tabs, newlines and
+    # backslashes are escaped
+    line = lambda row: '\t'.join(['\\N' if value is None else str(value).translate(TSV_ESCAPES) for value in row]) + '\n'
+    out.write(line(names))
+    for batch in batches(rows):
+        out.write(''.join(map(line, batch)))
+
+def render_jsonl(names, rows, out):
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    for batch in batches(rows):
+        out.write(''.join([dumps(dict(zip(names, row)))+'\n' for row in batch]))
+
+FORMATS = {'table':render_table, 'csv':render_csv, 'tsv':render_tsv, 'jsonl':render_jsonl}
+
+def render(names, rows, fmt='table', out=None):
+    FORMATS[fmt](names, iter(rows), sys.stdout if out is None else out)
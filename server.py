@@ -0,0 +1,211 @@
+import argparse
+import io
+import json
+import os
+import queue
+import selectors
+import signal
+import socket
+import sys
+import threading
+import lark
+from bsddb3 import db
+from storage import Environment, Storage
+from parser import Transformer, build_parser, split_queries
+from cache import ResultCache
+from profiling import SlowLog, SLOW_MS
+from client import parse_address, send_msg, recv_msg
+
+DEADLOCK_RETRIES = 5
+EXPIRE_INTERVAL = 1
+
+class ThreadOutput:
+    # the engine print()s its results; every worker points its own thread's
+    # sys.stdout at the reply it is building
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def write(self, s):
+        return getattr(self.local, 'buf', self.default).write(s)
+
+    def flush(self):
+        getattr(self.local, 'buf', self.default).flush()
+
+class Worker(threading.Thread):
+    # a pooled Transformer and parser; a request runs in the session of the
+    # connection it came from, so the worker itself holds no transaction
+    def __init__(self, server, requests):
+        super().__init__(daemon=True)
+        self.server = server
+        self.requests = requests
+        self.transformer = Transformer(None)
+        self.transformer.cache = server.cache
+        self.transformer.slow_log = server.slow_log
+        self.transformer.parallel = server.parallel
+        # clients read server files only under --copy-dir
+        self.transformer.copy_dir = server.copy_dir or ''
+        self.parser = build_parser(self.transformer)
+
+    def run(self):
+        server = self.server
+        while (conn:=self.requests.get()) is not None:
+            try:
+                if (sql:=recv_msg(conn)) is None:
+                    server.disconnect(conn)
+                    continue
+                reply, done = self.execute(server.sessions[conn], sql.decode())
+                send_msg(conn, json.dumps(reply).encode())
+            except (OSError, UnicodeDecodeError):
+                server.disconnect(conn)
+                continue
+            if done:
+                server.disconnect(conn)
+            else:
+                server.ready(conn)
+
+    def execute(self, session, sql):
+        # statements run one after the other and stop at the first error. BDB
+        # locks serialize writers; a statement picked as a deadlock victim is
+        # retried on its own, or rolls back the transaction it is part of. one
+        # that waited out the lock timeout fails the same way, without a retry
+        out = sys.stdout.local.buf = io.StringIO()
+        transformer = self.transformer
+        transformer.store = session
+        error, done = None, False
+        for query in split_queries(sql):
+            mark = out.tell()
+            for _ in range(DEADLOCK_RETRIES):
+                transformer.clean(query)
+                try:
+                    with session.statement():
+                        self.parser.parse(query)
+                except db.DBLockDeadlockError:
+                    out.seek(mark); out.truncate()
+                    if session.txn is None:
+                        continue
+                    session.rollback()
+                    print("Transaction has failed: deadlock, transaction rolled back")
+                    error = 'DBLockDeadlockError'
+                except db.DBLockNotGrantedError:
+                    out.seek(mark); out.truncate()
+                    if session.txn is None:
+                        print("Query has failed: lock wait timeout")
+                    else:
+                        session.rollback()
+                        print("Transaction has failed: lock wait timeout, transaction rolled back")
+                    error = 'DBLockNotGrantedError'
+                except lark.exceptions.UnexpectedInput:
+                    print("Syntax error")
+                    error = 'SyntaxError'
+                except SystemExit:
+                    done = True
+                except Exception as e:
+                    error = type(e).__name__
+                break
+            else:
+                print("Query has failed: deadlock")
+                error = 'DBLockDeadlockError'
+            if error is not None or done:
+                break
+        return dict(output=out.getvalue(), error=error), done
+
+class Server:
+    # the main thread waits for connections and requests; a readable connection
+    # is handed to the worker pool and watched again once its reply is sent.
+    # sessions inside a transaction have a worker of their own, so the COMMIT
+    # that releases their locks is served even while every pooled worker waits
+    # on them
+    def __init__(self, home, address, workers=8, cache_size=0, slow_log=None, parallel=0, copy_dir=None):
+        if not isinstance(sys.stdout, ThreadOutput):
+            sys.stdout = ThreadOutput(sys.stdout)
+        self.env = Environment(home)
+        # one result cache for every session
+        self.cache = ResultCache(cache_size) if cache_size else None
+        self.slow_log = slow_log
+        self.parallel = parallel
+        self.copy_dir = copy_dir
+        Storage(env=self.env).close()
+        family, self.addr = parse_address(address)
+        if family==socket.AF_UNIX and os.path.exists(self.addr):
+            os.remove(self.addr)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        if family==socket.AF_INET:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(self.addr)
+        self.sock.listen(128)
+        self.sessions = {}
+        self.requests = queue.Queue()
+        self.txn_requests = queue.Queue()
+        self.pending = queue.Queue()
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+        self.selector.register(self.wake_r, selectors.EVENT_READ)
+        self.workers = [Worker(self, self.requests) for _ in range(workers)] + [Worker(self, self.txn_requests)]
+        for worker in self.workers:
+            worker.start()
+
+    def ready(self, conn):
+        self.pending.put(conn)
+        self.wake_w.send(b'\0')
+
+    def disconnect(self, conn):
+        if (session:=self.sessions.pop(conn, None)) is not None:
+            session.close()
+        conn.close()
+
+    def serve_forever(self):
+        while True:
+            # lock waits time out when the detector runs, which a blocked
+            # request alone does not trigger again
+            self.env.expire_locks()
+            for key,_ in self.selector.select(EXPIRE_INTERVAL):
+                if key.fileobj is self.sock:
+                    conn,_ = self.sock.accept()
+                    self.sessions[conn] = Storage(env=self.env)
+                    self.selector.register(conn, selectors.EVENT_READ)
+                elif key.fileobj is self.wake_r:
+                    self.wake_r.recv(4096)
+                    while not self.pending.empty():
+                        self.selector.register(self.pending.get(), selectors.EVENT_READ)
+                else:
+                    self.selector.unregister(key.fileobj)
+                    in_txn = self.sessions[key.fileobj].txn is not None
+                    (self.txn_requests if in_txn else self.requests).put(key.fileobj)
+
+    def close(self):
+        for worker in self.workers:
+            worker.requests.put(None)
+        for worker in self.workers:
+            worker.join()
+        for conn in list(self.sessions):
+            self.disconnect(conn)
+        self.sock.close()
+        if isinstance(self.addr, str) and os.path.exists(self.addr):
+            os.remove(self.addr)
+        if self.slow_log is not None:
+            self.slow_log.close()
+        self.env.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="serve the database to many clients")
+    ap.add_argument('--home', default='.')
+    ap.add_argument('--listen', default='127.0.0.1:5433', help="host:port or the path of a unix socket")
+    ap.add_argument('--workers', type=int, default=8)
+    ap.add_argument('--cache-size', type=int, default=0, help="bytes of select results to keep")
+    ap.add_argument('--slow-log', help="append statements slower than --slow-ms to this file")
+    ap.add_argument('--slow-ms', type=float, default=SLOW_MS)
+    ap.add_argument('--parallel', type=int, default=0, help="processes to spread filtered scans of large tables over")
+    ap.add_argument('--copy-dir', help="directory COPY may read files from; without it COPY from a file is refused")
+    args = ap.parse_args()
+
+    server = Server(args.home, args.listen, args.workers, args.cache_size, SlowLog(args.slow_log, args.slow_ms) if args.slow_log else None, args.parallel, args.copy_dir)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit())
+    print(f"listening on {args.listen}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -0,0 +1,100 @@
+import bisect
+import random
+from collections import Counter
+
+# what ANALYZE gathers about a table, kept in its catalog entry as 'stats': the
+# row count at the time and, per column, the number of distinct values, the
+# fraction of nulls, min, max and an equi-depth histogram, BUCKETS+1 bounds with
+# about as many values between every two. the histogram and the distinct count
+# come from a sample of SAMPLE rows, the rest is exact. the planner scales
+# fractions by the live row count, which the writes keep up to date, so stats
+# only go stale in shape
+BUCKETS = 10
+SAMPLE = 30000
+# the fraction of a table a condition the statistics say nothing about keeps
+DEFAULT_FRACTION = 1/3
+# a range read through an index past this fraction of the table costs more than
+# reading the whole of it in order
+SEQ_FRACTION = 0.2
+
+def gather(store, tbl_name, tbl):
+    col_names = list(tbl['cols'])
+    rnd = random.Random(0)
+    rows = 0
+    nulls = [0]*len(col_names)
+    lows, highs = [None]*len(col_names), [None]*len(col_names)
+    sample = []
+    for _,record in store.scan(tbl_name):
+        rows += 1
+        for i,value in enumerate(record):
+            if value is None:
+                nulls[i] += 1
+            else:
+                if lows[i] is None or value<lows[i]:
+                    lows[i] = value
+                if highs[i] is None or value>highs[i]:
+                    highs[i] = value
+        if len(sample)<SAMPLE:
+            sample.append(record)
+        elif (j:=rnd.randrange(rows))<SAMPLE:
+            sample[j] = record
+
+    cols = {}
+    for i,col_name in enumerate(col_names):
+        lo, hi = lows[i], highs[i]
+        values = sorted(record[i] for record in sample if record[i] is not None)
+        hist = []
+        if values:
+            # the sample may have missed the ends
+            hist = [lo] + [values[len(values)*k//BUCKETS] for k in range(1, BUCKETS)] + [hi]
+        cols[col_name] = dict(distinct=distinct(values, rows-nulls[i]), nulls=nulls[i]/rows if rows else 0.0, min=lo, max=hi, hist=hist)
+    return dict(rows=rows, cols=cols)
+
+def distinct(values, total):
+    # the distinct values among total, from those of a sample of them: the
+    # estimator of Haas and Stokes, which postgres uses too. values seen once in
+    # the sample stand for the values it missed
+    if len(values)==total:
+        return len(set(values))
+    if len(values)==0:
+        return 1
+    counts = Counter(values)
+    once = sum(1 for n in counts.values() if n==1)
+    n = len(values)
+    return min(total, round(n*len(counts)/(n-once+once*n/total)))
+
+def equal(col, value):
+    # fractions are of the non null values
+    if col['min'] is None or value<col['min'] or value>col['max']:
+        return 0.0
+    return 1/col['distinct']
+
+def below(col, value):
+    hist = col['hist']
+    if not hist or value<=hist[0]:
+        return 0.0
+    if value>hist[-1]:
+        return 1.0
+    i = bisect.bisect_left(hist, value)
+    lo, hi = hist[i-1], hist[i]
+    within = (value-lo)/(hi-lo) if isinstance(value, int) else 0.5
+    return (i-1+within)/(len(hist)-1)
+
+def fraction(col, ops):
+    # of the rows, those whose value satisfies every (op, value) of ops, where
+    # ('=', None) is `is null`
+    if any(value is None for _,value in ops):
+        return col['nulls'] if len(ops)==1 else 0.0
+    if len(eq:={value for op,value in ops if op=='='})!=0:
+        return (1-col['nulls'])*equal(col, eq.pop()) if len(eq)==1 else 0.0
+    lo, hi = 0.0, 1.0
+    for op,value in ops:
+        if op=='<':
+            hi = min(hi, below(col, value))
+        elif op=='<=':
+            hi = min(hi, below(col, value)+equal(col, value))
+        elif op=='>':
+            lo = max(lo, below(col, value)+equal(col, value))
+        elif op=='>=':
+            lo = max(lo, below(col, value))
+    return (1-col['nulls'])*max(hi-lo, 0.0)
@@ -0,0 +1,703 @@
+import os
+import json
+import struct
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from bsddb3 import db
+
+# catalog entries keep only the schema; rows of every table live in their own
+# B-tree keyed by a big-endian row id, so a cursor walks them in insertion order
+RID = struct.Struct('>Q')
+INT_KEY = struct.Struct('>Q')
+INT_MIN, INT_MAX = -(1<<63), (1<<63)-1
+CATALOG_VERSION = b'\x00version'
+MAX_LOCKS = 100000
+# microseconds a lock request waits before it fails: a transaction left open by
+# an idle session is waiting on nothing, so the deadlock detector never breaks it
+LOCK_TIMEOUT = 5000000
+
+def encode_key(values):
+    # order preserving: nulls sort first, ints are biased to unsigned big-endian,
+    # strings are escaped and terminated so a tuple prefix is also a key prefix
+    key = bytearray()
+    for value in values:
+        if value is None:
+            key += b'\x00'
+        elif isinstance(value, int):
+            if not (INT_MIN<=value<=INT_MAX):
+                raise ValueError(f"int key out of range: {value}")
+            key += b'\x01' + INT_KEY.pack(value-INT_MIN)
+        else:
+            key += b'\x01' + value.encode().replace(b'\x00', b'\x00\xff') + b'\x00\x00'
+    return bytes(key)
+
+class RowCodec:
+    # rows are a null bitmap, one fixed width slot per column (ints as 8 bytes,
+    # dates as yyyymmdd in 4, chars as the end offset of their text) and then the
+    # utf-8 text of the char columns back to back, so any column can be read from
+    # its slot without decoding the rest of the row
+    def __init__(self, cols):
+        types = [col_info[0] for col_info in cols.values()]
+        self.ncols = len(types)
+        self.chars = [i for i,c_type in enumerate(types) if c_type=='char']
+        self.dates = [i for i,c_type in enumerate(types) if c_type=='date']
+        text = sum(4*col_info[1] for col_info in cols.values() if col_info[0]=='char')
+        slot = {'int':'q', 'date':'I', 'char':'H' if text<(1<<16) else 'I'}
+        nbytes = (self.ncols+7)//8
+        self.no_nulls = bytes(nbytes)
+        self.fixed = struct.Struct(f'>{nbytes}s' + ''.join(slot[c_type] for c_type in types))
+        self.slots = []
+        off = nbytes
+        for c_type in types:
+            self.slots.append((struct.Struct('>'+slot[c_type]), off))
+            off += struct.calcsize('>'+slot[c_type])
+        self.prev_char = {}
+        for prev,i in zip([None]+self.chars, self.chars):
+            self.prev_char[i] = prev
+
+    def encode(self, row):
+        nulls = 0
+        values = list(row)
+        text = []
+        end = 0
+        for i in self.chars:
+            if (value:=values[i]) is not None:
+                value = value.encode()
+                text.append(value)
+                end += len(value)
+            values[i] = end
+        for i in self.dates:
+            if (value:=values[i]) is not None:
+                values[i] = int(value[:4]+value[5:7]+value[8:10])
+        for i,value in enumerate(row):
+            if value is None:
+                nulls |= 1<<i
+                if i not in self.prev_char:
+                    values[i] = 0
+        return self.fixed.pack(nulls.to_bytes(len(self.no_nulls), 'little'), *values) + b''.join(text)
+
+    def decode(self, data):
+        row = list(self.fixed.unpack_from(data))
+        nulls = row.pop(0)
+        start = base = self.fixed.size
+        for i in self.chars:
+            end = base+row[i]
+            row[i] = data[start:end].decode()
+            start = end
+        for i in self.dates:
+            value = row[i]
+            row[i] = '%04d-%02d-%02d' % (value//10000, value//100%100, value%100)
+        if nulls!=self.no_nulls:
+            nulls = int.from_bytes(nulls, 'little')
+            for i in range(self.ncols):
+                if nulls>>i&1:
+                    row[i] = None
+        return row
+
+    def column(self, data, i):
+        if data[i>>3]>>(i&7)&1:
+            return None
+        slot, off = self.slots[i]
+        value = slot.unpack_from(data, off)[0]
+        if i in self.prev_char:
+            prev = self.prev_char[i]
+            start = 0 if prev is None else self.slots[prev][0].unpack_from(data, self.slots[prev][1])[0]
+            return data[self.fixed.size+start:self.fixed.size+value].decode()
+        if i in self.dates:
+            return '%04d-%02d-%02d' % (value//10000, value//100%100, value%100)
+        return value
+
+class Environment:
+    # one per database directory: the transactional Berkeley DB environment and
+    # the database handles, shared by every session (Storage) opened on it.
+    # commits are written to the log without waiting for the disk, then wait for
+    # a flusher thread that syncs the log up to every commit written before it
+    # started; the commits of other sessions piling up during one fsync share the
+    # next. a commit returns only once it is on disk
+    def __init__(self, home='.', group_commit=True):
+        self.home = home
+        self.group_commit = group_commit
+        adopt = not any(name.startswith('log.') for name in os.listdir(home))
+        self.env = db.DBEnv()
+        self.env.set_lk_detect(db.DB_LOCK_DEFAULT)
+        self.env.set_timeout(LOCK_TIMEOUT, db.DB_SET_LOCK_TIMEOUT)
+        self.env.set_lk_max_locks(MAX_LOCKS)
+        self.env.set_lk_max_objects(MAX_LOCKS)
+        self.env.log_set_config(db.DB_LOG_AUTO_REMOVE, 1)
+        self.env.open(home, db.DB_CREATE|db.DB_INIT_TXN|db.DB_INIT_LOG|db.DB_INIT_LOCK|db.DB_INIT_MPOOL|db.DB_RECOVER|db.DB_THREAD)
+        if adopt:
+            # files written before the environment existed carry no log sequence numbers
+            for name in os.listdir(home):
+                if name.endswith('.db'):
+                    self.env.lsn_reset(name)
+        self.cdb = self.open_db('cdb.db', db.DB_HASH)
+        self.rdbs = {}
+        self.idbs = {}
+        # the row count and version of a table live apart from the catalog, so
+        # writers do not lock the catalog version every statement reads, and in
+        # a database of its own, so they share no page with other tables'
+        self.cnts = {}
+        self.lock = threading.Lock()
+        self.migrated = False
+        # commits written to the log, and how many of them are on disk
+        self.written = 0
+        self.synced = 0
+        self.flushed = threading.Condition()
+        self.closing = False
+        self.flusher_thread = None
+        if group_commit:
+            self.flusher_thread = threading.Thread(target=self.flusher, daemon=True)
+            self.flusher_thread.start()
+
+    def open_db(self, file, dbtype=db.DB_BTREE):
+        # handles are opened in transactions of their own so they outlive any
+        # statement that happens to open them first
+        handle = db.DB(self.env)
+        handle.open(file, dbtype=dbtype, flags=db.DB_CREATE|db.DB_AUTO_COMMIT|db.DB_THREAD)
+        return handle
+
+    def rows_db(self, tbl_name):
+        if (rdb:=self.rdbs.get(tbl_name)) is None:
+            with self.lock:
+                if (rdb:=self.rdbs.get(tbl_name)) is None:
+                    rdb = self.rdbs[tbl_name] = self.open_db(rows_file(tbl_name))
+        return rdb
+
+    def index_db(self, tbl_name, idx_name):
+        if (idb:=self.idbs.get((tbl_name,idx_name))) is None:
+            with self.lock:
+                if (idb:=self.idbs.get((tbl_name,idx_name))) is None:
+                    idb = self.idbs[(tbl_name,idx_name)] = self.open_db(index_file(tbl_name, idx_name))
+        return idb
+
+    def counts_db(self, tbl_name):
+        if (cnt:=self.cnts.get(tbl_name)) is None:
+            with self.lock:
+                if (cnt:=self.cnts.get(tbl_name)) is None:
+                    cnt = self.cnts[tbl_name] = self.open_db(counts_file(tbl_name))
+        return cnt
+
+    def remove(self, txn, handles, key, file):
+        with self.lock:
+            if (handle:=handles.pop(key, None)) is not None:
+                handle.close()
+        if os.path.exists(os.path.join(self.home, file)):
+            self.env.dbremove(file, txn=txn)
+
+    def expire_locks(self):
+        self.env.lock_detect(db.DB_LOCK_EXPIRE)
+
+    def commit(self, txn):
+        if not self.group_commit:
+            txn.commit()
+            return
+        txn.commit(db.DB_TXN_NOSYNC)
+        with self.flushed:
+            self.written += 1
+            mine = self.written
+            self.flushed.notify_all()
+            while self.synced<mine:
+                self.flushed.wait()
+
+    def flusher(self):
+        while True:
+            with self.flushed:
+                while self.synced==self.written and not self.closing:
+                    self.flushed.wait()
+                if self.synced==self.written:
+                    return
+                upto = self.written
+            self.env.log_flush()
+            with self.flushed:
+                self.synced = upto
+                self.flushed.notify_all()
+
+    def close(self):
+        # the flusher syncs what is still waiting and stops before the handles go
+        if self.flusher_thread is not None:
+            with self.flushed:
+                self.closing = True
+                self.flushed.notify_all()
+            self.flusher_thread.join()
+        for handle in list(self.rdbs.values())+list(self.idbs.values())+list(self.cnts.values()):
+            handle.close()
+        self.rdbs.clear()
+        self.idbs.clear()
+        self.cnts.clear()
+        self.cdb.close()
+        self.env.log_flush()
+        self.env.txn_checkpoint()
+        self.env.close()
+
+def rows_file(tbl_name):
+    return f'{tbl_name}.tbl.db'
+
+def index_file(tbl_name, idx_name):
+    return f'{tbl_name}.{idx_name}.idx.db'
+
+def counts_file(tbl_name):
+    return f'{tbl_name}.cnt.db'
+
+class Storage:
+    # a session: the transaction BEGIN opened, if any, and the one of the
+    # running statement, nested in it. every read and write goes through the
+    # statement transaction, which is started by the first access
+    def __init__(self, home='.', env=None):
+        self.own_env = env is None
+        self.env = Environment(home) if env is None else env
+        self.cdb = self.env.cdb
+        self.txn = None
+        self.stmt = None
+        self.cursors = set()
+        self.tables = {}
+        self.offs = {}
+        self.codecs = {}
+        self.version = None
+        # rows and bytes of stored rows read and written, for profiling
+        self.rows_read = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        with self.env.lock:
+            migrate, self.env.migrated = not self.env.migrated, True
+        if migrate:
+            with self.statement():
+                self.migrate()
+
+    def close(self):
+        if self.txn is not None:
+            self.rollback()
+        if self.own_env:
+            self.env.close()
+
+    def rows_db(self, tbl_name):
+        return self.env.rows_db(tbl_name)
+
+    def index_db(self, tbl_name, idx_name):
+        return self.env.index_db(tbl_name, idx_name)
+
+    def counts_db(self, tbl_name):
+        return self.env.counts_db(tbl_name)
+
+    # transactions
+    def stmt_txn(self):
+        if self.stmt is None:
+            self.stmt = self.env.env.txn_begin(self.txn)
+            # other sessions may have changed the schema since the last statement;
+            # reading the version also keeps them from doing so until this one ends
+            if (version:=self.cdb.get(CATALOG_VERSION, txn=self.stmt))!=self.version:
+                self.forget()
+                self.version = version
+        return self.stmt
+
+    @contextmanager
+    def statement(self):
+        try:
+            yield
+        except BaseException:
+            self.end_statement(False)
+            raise
+        self.end_statement(True)
+
+    def end_statement(self, commit):
+        for cursor in list(self.cursors):
+            self.close_cursor(cursor)
+        if (stmt:=self.stmt) is None:
+            return
+        self.stmt = None
+        if not commit:
+            stmt.abort()
+            self.forget()
+        elif self.txn is None:
+            self.env.commit(stmt)
+        else:
+            stmt.commit()
+
+    def begin(self):
+        self.end_statement(True)
+        self.txn = self.env.env.txn_begin()
+
+    def commit(self):
+        self.end_statement(True)
+        txn, self.txn = self.txn, None
+        self.env.commit(txn)
+
+    def rollback(self):
+        self.end_statement(False)
+        txn, self.txn = self.txn, None
+        txn.abort()
+        self.forget()
+
+    def forget(self):
+        # cached catalog entries may hold changes that were just rolled back
+        self.tables.clear()
+        self.offs.clear()
+        self.codecs.clear()
+
+    def cursor(self, handle):
+        cursor = handle.cursor(txn=self.stmt_txn())
+        self.cursors.add(cursor)
+        return cursor
+
+    def close_cursor(self, cursor):
+        # a scan left unfinished by an error is closed when its statement ends
+        if cursor in self.cursors:
+            self.cursors.discard(cursor)
+            cursor.close()
+
+    # catalog; entries are parsed once and kept until put_table or drop_table
+    # replaces them, so callers share (and must not modify without putting) them.
+    # the statement transaction comes first: starting it drops the cached
+    # entries when another session has changed the catalog
+    def get_table(self, tbl_name):
+        txn = self.stmt_txn()
+        if (tbl:=self.tables.get(tbl_name)) is not None:
+            return tbl
+        if (tbl:=self.cdb.get(tbl_name.encode(), txn=txn)) is None:
+            return None
+        tbl = self.tables[tbl_name] = json.loads(tbl, object_pairs_hook=OrderedDict)
+        return tbl
+
+    def put_table(self, tbl_name, tbl):
+        self.cdb.put(tbl_name.encode(), json.dumps(tbl).encode(), txn=self.stmt_txn())
+        self.bump_version()
+        self.tables[tbl_name] = tbl
+        self.offs.pop(tbl_name, None)
+        self.codecs.pop(tbl_name, None)
+
+    def bump_version(self):
+        version = 0 if self.version is None else RID.unpack(self.version)[0]
+        self.version = RID.pack(version+1)
+        self.cdb.put(CATALOG_VERSION, self.version, txn=self.stmt_txn())
+
+    def offsets(self, tbl_name):
+        # column name -> position in a stored row
+        self.stmt_txn()
+        if (offs:=self.offs.get(tbl_name)) is None:
+            offs = self.offs[tbl_name] = {col_name:i for i,col_name in enumerate(self.get_table(tbl_name)['cols'])}
+        return offs
+
+    def codec(self, tbl_name):
+        self.stmt_txn()
+        if (codec:=self.codecs.get(tbl_name)) is None:
+            codec = self.codecs[tbl_name] = RowCodec(self.get_table(tbl_name)['cols'])
+        return codec
+
+    def table_names(self):
+        cursor = self.cursor(self.cdb)
+        names = []
+        while (kv:=cursor.next()) is not None:
+            if kv[0]!=CATALOG_VERSION:
+                names.append(kv[0].decode())
+        self.close_cursor(cursor)
+        return names
+
+    def create_table(self, tbl_name, tbl):
+        tbl['encoding'] = 'binary'
+        self.put_table(tbl_name, tbl)
+        self.rows_db(tbl_name).truncate(txn=self.stmt_txn())
+        self.set_row_count(tbl_name, 0)
+        for idx_name in tbl['indexes']:
+            self.index_db(tbl_name, idx_name).truncate(txn=self.stmt_txn())
+
+    def drop_table(self, tbl_name, tbl):
+        self.cdb.delete(tbl_name.encode(), txn=self.stmt_txn())
+        self.tables.pop(tbl_name, None)
+        self.offs.pop(tbl_name, None)
+        self.codecs.pop(tbl_name, None)
+        self.bump_version()
+        env = self.env
+        env.remove(self.stmt_txn(), env.rdbs, tbl_name, rows_file(tbl_name))
+        env.remove(self.stmt_txn(), env.cnts, tbl_name, counts_file(tbl_name))
+        for idx_name in tbl['indexes']:
+            env.remove(self.stmt_txn(), env.idbs, (tbl_name,idx_name), index_file(tbl_name, idx_name))
+
+    # the number of rows of every table, kept up to date by the writes below
+    def row_count(self, tbl_name):
+        return RID.unpack(self.counts_db(tbl_name).get(b'rows', txn=self.stmt_txn()))[0]
+
+    def set_row_count(self, tbl_name, count):
+        self.counts_db(tbl_name).put(b'rows', RID.pack(count), txn=self.stmt_txn())
+
+    def add_row_count(self, tbl_name, delta):
+        cnt = self.counts_db(tbl_name)
+        count = RID.unpack(cnt.get(b'rows', txn=self.stmt_txn(), flags=db.DB_RMW))[0]
+        cnt.put(b'rows', RID.pack(count+delta), txn=self.stmt_txn())
+
+    # and a version per table, bumped by every write to it, which cached
+    # results are checked against
+    def table_version(self, tbl_name):
+        version = self.counts_db(tbl_name).get(b'version', txn=self.stmt_txn())
+        return 0 if version is None else RID.unpack(version)[0]
+
+    def bump_table_version(self, tbl_name):
+        cnt = self.counts_db(tbl_name)
+        version = cnt.get(b'version', txn=self.stmt_txn(), flags=db.DB_RMW)
+        cnt.put(b'version', RID.pack(1 if version is None else RID.unpack(version)[0]+1), txn=self.stmt_txn())
+
+    # indexes map the encoded column tuple to a row id; non unique ones append
+    # the row id to the key so equal tuples stay distinct and ordered
+    def index_key(self, offs, idx, record, rid):
+        key = encode_key([record[offs[col_name]] for col_name in idx['cols']])
+        return key if idx['unique'] else key+RID.pack(rid)
+
+    def index_lookup(self, tbl_name, tbl, idx_name, values):
+        idx = tbl['indexes'][idx_name]
+        prefix = encode_key(values)
+        idb = self.index_db(tbl_name, idx_name)
+        if idx['unique'] and len(values)==len(idx['cols']):
+            if (rid:=idb.get(prefix, txn=self.stmt_txn())) is not None:
+                yield RID.unpack(rid)[0]
+            return
+        cursor = self.cursor(idb)
+        try:
+            kv = cursor.set_range(prefix)
+            while kv is not None and kv[0].startswith(prefix):
+                yield RID.unpack(kv[1])[0]
+                kv = cursor.next()
+        finally:
+            self.close_cursor(cursor)
+
+    def index_range(self, tbl_name, idx_name, values, lo=None, hi=None):
+        # row ids whose key starts with values and whose next column lies between
+        # lo and hi, each a (value, inclusive) pair or None; nulls are in no range
+        prefix = encode_key(values)
+        start = prefix+b'\x01' if lo is None else encode_key(values+[lo[0]])
+        stop = None if hi is None else encode_key(values+[hi[0]])
+        cursor = self.cursor(self.index_db(tbl_name, idx_name))
+        try:
+            kv = cursor.set_range(start)
+            if lo is not None and not lo[1]:
+                while kv is not None and kv[0].startswith(start):
+                    kv = cursor.next()
+            while kv is not None and kv[0].startswith(prefix):
+                if stop is not None and kv[0]>=stop and not (hi[1] and kv[0].startswith(stop)):
+                    break
+                yield RID.unpack(kv[1])[0]
+                kv = cursor.next()
+        finally:
+            self.close_cursor(cursor)
+
+    def index_walk(self, tbl_name, idx_name, backward=False):
+        # every row id of an index, in key order or backwards
+        cursor = self.cursor(self.index_db(tbl_name, idx_name))
+        try:
+            step = cursor.prev if backward else cursor.next
+            while (kv:=step()) is not None:
+                yield RID.unpack(kv[1])[0]
+        finally:
+            self.close_cursor(cursor)
+
+    def index_keys(self, tbl_name, tbl, idx_name):
+        # the encoded column tuple of every entry, without the appended row id
+        cut = None if tbl['indexes'][idx_name]['unique'] else -RID.size
+        cursor = self.cursor(self.index_db(tbl_name, idx_name))
+        try:
+            while (kv:=cursor.next()) is not None:
+                yield kv[0][:cut]
+        finally:
+            self.close_cursor(cursor)
+
+    def create_index(self, tbl_name, tbl, idx_name, cols):
+        tbl['indexes'][idx_name] = dict(cols=cols, unique=False)
+        self.put_table(tbl_name, tbl)
+        self.build_index(tbl_name, tbl, idx_name)
+
+    def drop_index(self, tbl_name, tbl, idx_name):
+        del tbl['indexes'][idx_name]
+        self.put_table(tbl_name, tbl)
+        self.env.remove(self.stmt_txn(), self.env.idbs, (tbl_name,idx_name), index_file(tbl_name, idx_name))
+
+    def build_index(self, tbl_name, tbl, idx_name):
+        idx = tbl['indexes'][idx_name]
+        idb = self.index_db(tbl_name, idx_name)
+        txn = self.stmt_txn()
+        idb.truncate(txn=txn)
+        offs = self.offsets(tbl_name)
+        for rid,record in self.scan(tbl_name):
+            idb.put(self.index_key(offs, idx, record, rid), RID.pack(rid), txn=txn)
+
+    # rows
+    def scan(self, tbl_name):
+        decode = self.codec(tbl_name).decode
+        cursor = self.cursor(self.rows_db(tbl_name))
+        n = size = 0
+        try:
+            while (kv:=cursor.next()) is not None:
+                n += 1; size += len(kv[1])
+                yield RID.unpack(kv[0])[0], decode(kv[1])
+        finally:
+            self.rows_read += n; self.bytes_read += size
+            self.close_cursor(cursor)
+
+    def scan_columns(self, tbl_name, col_names):
+        # tuples of a few columns, read straight from their slots
+        codec = self.codec(tbl_name)
+        inds = [self.offsets(tbl_name)[col_name] for col_name in col_names]
+        cursor = self.cursor(self.rows_db(tbl_name))
+        n = size = 0
+        try:
+            while (kv:=cursor.next()) is not None:
+                n += 1; size += len(kv[1])
+                yield tuple(codec.column(kv[1], i) for i in inds)
+        finally:
+            self.rows_read += n; self.bytes_read += size
+            self.close_cursor(cursor)
+
+    def scan_batches(self, tbl_name, size, keys=False):
+        # lists of stored rows, still encoded, or with keys a pair of the list of
+        # their packed row ids and them; the first batches are small so a
+        # consumer that stops early does not read much more than it needs
+        cursor = self.cursor(self.rows_db(tbl_name))
+        try:
+            rids, batch, limit = [], [], min(1024, size)
+            while (kv:=cursor.next()) is not None:
+                rids.append(kv[0]); batch.append(kv[1])
+                if len(batch)==limit:
+                    self.rows_read += len(batch); self.bytes_read += sum(map(len, batch))
+                    yield (rids, batch) if keys else batch
+                    rids, batch, limit = [], [], min(2*limit, size)
+            if batch:
+                self.rows_read += len(batch); self.bytes_read += sum(map(len, batch))
+                yield (rids, batch) if keys else batch
+        finally:
+            self.close_cursor(cursor)
+
+    def get_row(self, tbl_name, rid):
+        if (record:=self.rows_db(tbl_name).get(RID.pack(rid), txn=self.stmt_txn())) is None:
+            return None
+        self.rows_read += 1; self.bytes_read += len(record)
+        return self.codec(tbl_name).decode(record)
+
+    def next_rid(self, tbl_name):
+        cursor = self.cursor(self.rows_db(tbl_name))
+        last = cursor.last()
+        self.close_cursor(cursor)
+        return 1 if last is None else RID.unpack(last[0])[0]+1
+
+    def insert_rows(self, tbl_name, tbl, rows):
+        rdb = self.rows_db(tbl_name)
+        idbs = [(idx, self.index_db(tbl_name, idx_name)) for idx_name,idx in tbl['indexes'].items()]
+        offs = self.offsets(tbl_name)
+        encode = self.codec(tbl_name).encode
+        txn = self.stmt_txn()
+        rid = self.next_rid(tbl_name)
+        size = 0
+        for row in rows:
+            rdb.put(RID.pack(rid), data:=encode(row), txn=txn)
+            size += len(data)
+            for idx,idb in idbs:
+                idb.put(self.index_key(offs, idx, row, rid), RID.pack(rid), txn=txn)
+            rid += 1
+        self.bytes_written += size
+        self.add_row_count(tbl_name, len(rows))
+        self.bump_table_version(tbl_name)
+
+    def update_rows(self, tbl_name, tbl, rows, cols):
+        # rows keep their row ids; only indexes over a changed column are touched
+        rdb = self.rows_db(tbl_name)
+        idbs = [(idx, self.index_db(tbl_name, idx_name)) for idx_name,idx in tbl['indexes'].items() if not cols.isdisjoint(idx['cols'])]
+        offs = self.offsets(tbl_name)
+        encode = self.codec(tbl_name).encode
+        txn = self.stmt_txn()
+        size = 0
+        for rid,old,new in rows:
+            rdb.put(RID.pack(rid), data:=encode(new), txn=txn)
+            size += len(data)
+            for idx,idb in idbs:
+                if (old_key:=self.index_key(offs, idx, old, rid))!=(new_key:=self.index_key(offs, idx, new, rid)):
+                    idb.delete(old_key, txn=txn)
+                    idb.put(new_key, RID.pack(rid), txn=txn)
+        self.bytes_written += size
+        self.bump_table_version(tbl_name)
+
+    def delete_rows(self, tbl_name, tbl, records):
+        rdb = self.rows_db(tbl_name)
+        idbs = [(idx, self.index_db(tbl_name, idx_name)) for idx_name,idx in tbl['indexes'].items()]
+        offs = self.offsets(tbl_name)
+        txn = self.stmt_txn()
+        for rid,row in records:
+            rdb.delete(RID.pack(rid), txn=txn)
+            for idx,idb in idbs:
+                idb.delete(self.index_key(offs, idx, row, rid), txn=txn)
+        self.add_row_count(tbl_name, -len(records))
+        self.bump_table_version(tbl_name)
+
+    def truncate(self, tbl_name, tbl):
+        # frees the pages without decoding a row; the count is kept apart
+        txn = self.stmt_txn()
+        count = self.row_count(tbl_name)
+        for idx_name in tbl['indexes']:
+            self.index_db(tbl_name, idx_name).truncate(txn=txn)
+        self.rows_db(tbl_name).truncate(txn=txn)
+        self.set_row_count(tbl_name, 0)
+        self.bump_table_version(tbl_name)
+        return count
+
+    def migrate(self):
+        # older cdb.db files kept every row inside the catalog entry as a 'data'
+        # list with ints stored as text; move them out into the row databases
+        for tbl_name in self.table_names():
+            tbl = self.get_table(tbl_name)
+            if 'data' in tbl:
+                int_cols = [i for i,col_info in enumerate(tbl['cols'].values()) if col_info[0]=='int']
+                self.rows_db(tbl_name).truncate(txn=self.stmt_txn())
+                for rid,record in enumerate(tbl.pop('data'), 1):
+                    for i in int_cols:
+                        if record[i] is not None:
+                            record[i] = int(record[i])
+                    self.rows_db(tbl_name).put(RID.pack(rid), json.dumps(record).encode(), txn=self.stmt_txn())
+                self.put_table(tbl_name, tbl)
+            if tbl.get('encoding')!='binary':
+                # rows written before the binary format are json lists
+                rdb = self.rows_db(tbl_name)
+                tbl['encoding'] = 'binary'
+                self.put_table(tbl_name, tbl)
+                encode = self.codec(tbl_name).encode
+                cursor = self.cursor(rdb)
+                while (kv:=cursor.next()) is not None:
+                    cursor.put(kv[0], encode(json.loads(kv[1])), db.DB_CURRENT)
+                self.close_cursor(cursor)
+            if 'indexes' not in tbl:
+                tbl['indexes'] = OrderedDict()
+                if len(tbl['pks'])!=0:
+                    tbl['indexes']['pk'] = dict(cols=tbl['pks'], unique=True)
+                self.put_table(tbl_name, tbl)
+                for idx_name in tbl['indexes']:
+                    self.build_index(tbl_name, tbl, idx_name)
+
+            # one constraint per run of columns referencing a table, a new one
+            # starting where a referenced column comes again
+            refs = []
+            for here_col,(ref_tbl_name,ref_col) in tbl['fors'].items():
+                if len(refs)==0 or refs[-1][0]!=ref_tbl_name or ref_col in refs[-1][1]:
+                    refs.append((ref_tbl_name, {}))
+                refs[-1][1][ref_col] = here_col
+            for ref_tbl_name,ref_cols in refs:
+                ref_pks = self.get_table(ref_tbl_name)['pks']
+                cols = [ref_cols.get(ref_pk) for ref_pk in ref_pks]
+                if None in cols or any(idx.get('ref')==ref_tbl_name and idx['cols']==cols for idx in tbl['indexes'].values()):
+                    continue
+                idx_name = f'fk_{ref_tbl_name}'
+                n = 1
+                while idx_name in tbl['indexes']:
+                    n+=1; idx_name = f'fk_{ref_tbl_name}_{n}'
+                tbl['indexes'][idx_name] = dict(cols=cols, unique=False, ref=ref_tbl_name)
+                self.put_table(tbl_name, tbl)
+                self.build_index(tbl_name, tbl, idx_name)
+
+            # tables created before row counts were kept, or kept in the shared
+            # counts.db of older versions
+            if not self.counts_db(tbl_name).exists(b'rows', txn=self.stmt_txn()):
+                self.set_row_count(tbl_name, sum(map(len, self.scan_batches(tbl_name, 1<<16))))
+
+        # invrefs written by older versions could name the wrong table
+        invrefs = {tbl_name:OrderedDict() for tbl_name in self.table_names()}
+        for tbl_name in invrefs:
+            for here_col,(ref_tbl_name,ref_col) in self.get_table(tbl_name)['fors'].items():
+                invrefs[ref_tbl_name].setdefault(ref_col, []).append([tbl_name,here_col])
+        for tbl_name,tbl_invrefs in invrefs.items():
+            tbl = self.get_table(tbl_name)
+            if tbl['invrefs']!=tbl_invrefs:
+                tbl['invrefs'] = tbl_invrefs
+                self.put_table(tbl_name, tbl)